@@ -1,134 +1,631 @@
-from flask import Flask, jsonify, send_from_directory, request
-import pandas as pd
 import os
-from threading import Lock
-import subprocess
+import json
+from threading import Lock, Thread, Condition
 import sys
-
-app = Flask(__name__)
+import time
+import hashlib
+import functools
+import itertools
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-excel_path = os.path.join(BASE_DIR, "data.xlsx")
+sys.path.insert(0, BASE_DIR)
+import startup
 
-data_cache = {
-    'ip_test_details': None,
-}
-cache_lock = Lock()
+with startup.timed("import flask"):
+    from flask import Flask, jsonify, send_from_directory, request, Response, make_response
 
-def get_ip_test_details_df():
-    try:
-        xls = pd.ExcelFile(excel_path)
-        target_df = pd.read_excel(xls, 'Target')
-        pass_df = pd.read_excel(xls, 'Pass')
-        fail_df = pd.read_excel(xls, 'Fail')
-        unresolved_df = pd.read_excel(xls, 'Unresolved')
+pd = startup.lazy_import("pandas")
+np = startup.lazy_import("numpy")
 
-        target_df['SheetType'] = 'Target'
-        pass_df['SheetType'] = 'Pass'
-        fail_df['SheetType'] = 'Fail'
-        unresolved_df['SheetType'] = 'Unresolved'
-
-        df = pd.concat([target_df, pass_df, fail_df], ignore_index=True)
-
-        with cache_lock:
-            data_cache['ip_test_details'] = df
-            data_cache['unresolved'] = unresolved_df
-    except (FileNotFoundError, PermissionError):
-        with cache_lock:
-            df = data_cache.get('ip_test_details')
-            unresolved_df = data_cache.get('unresolved')
-        if df is None or unresolved_df is None:
-            raise RuntimeError('Test case data unavailable and cache is empty')
-    except Exception as e:
-        raise RuntimeError(str(e))
-    return df, unresolved_df, None
+app = Flask(__name__)
 
+REFRESH_INTERVAL_MINUTES = float(os.environ.get("REFRESH_INTERVAL_MINUTES", "0"))
+STREAM_CASES_THRESHOLD = int(os.environ.get("STREAM_CASES_THRESHOLD", "2000"))
+STREAM_CHUNK_SIZE = 1000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+VERSIONED_MAX_AGE = 365 * 24 * 3600
+EVENTS_POLL_SECONDS = float(os.environ.get("SNAPSHOT_EVENTS_POLL_SECONDS", "2"))
+EVENTS_HEARTBEAT_SECONDS = 15
+# Kept below gunicorn's worker timeout; EventSource reconnects on its own.
+EVENTS_STREAM_SECONDS = float(os.environ.get("SNAPSHOT_EVENTS_STREAM_SECONDS", "25"))
+# Load every project's snapshot while the app is imported. With gunicorn's
+# preload_app (see gunicorn.conf.py) that happens once in the master and the
+# forked workers share the loaded data.
+PRELOAD_SNAPSHOT = os.environ.get("PRELOAD_SNAPSHOT", "0") == "1"
+
+with startup.timed("import backend modules"):
+    import snapshot
+    import metrics
+    import profiling
+    import jira_client
+    import metadata
+    import jobs
+    import prog
+    import filters
+    import roles
+    import status
+
+excel_path = snapshot.EXCEL_PATH
+
+# One cache entry per project, each reloaded independently.
+data_caches = {}
+reload_locks = {}
+cache_lock = Lock()
 
-@app.route('/data/<module_name>')
-def get_module_data(module_name):
+def get_data_cache(project):
+    with cache_lock:
+        if project not in data_caches:
+            data_caches[project] = {
+                'key': None,
+                'failed_key': None,
+                'source': None,
+                'version': None,
+                'loaded_at': None,
+                'load_seconds': None,
+                'snapshot': None,
+            }
+            reload_locks[project] = Lock()
+        return data_caches[project], reload_locks[project]
+
+# Only the configured projects are served. Anything else is answered with a 404
+# before a cache entry, lock or file lookup is made for it.
+class UnknownProjectError(Exception):
+    pass
+
+@app.errorhandler(UnknownProjectError)
+def unknown_project(e):
+    return jsonify({'status': 'error', 'message': f'Unknown project: {e}'}), 404
+
+def request_project():
+    project = (request.args.get('project') or snapshot.DEFAULT_PROJECT).upper()
+    if project not in snapshot.PROJECTS:
+        raise UnknownProjectError(project)
+    return project
+
+def get_file_identity(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+# The source to load and where it is: the current snapshot version directory,
+# or the workbook when the project has no snapshot. The identity is that of the
+# version's manifest, which is new for every published version.
+def get_snapshot_source(project=snapshot.DEFAULT_PROJECT):
     try:
-        df, _, _ = get_ip_test_details_df()
-    except RuntimeError as e:
-        return jsonify({'error': str(e)}), 503
+        path = snapshot.current_dir(snapshot.project_dir(project))
+        return 'snapshot', get_file_identity(snapshot.manifest_path(path)), path
+    except FileNotFoundError:
+        path = snapshot.excel_path(project)
+        return 'xlsx', get_file_identity(path), path
+
+# Published snapshots are named by the manifest's version id, which is what the
+# publisher logged and what rollback takes. Workbooks (and snapshots written
+# before versions existed) only have their file's mtime and size to go by.
+def get_snapshot_version(source, identity, path):
+    if source == 'snapshot':
+        version = snapshot.read_manifest(path).get('version')
+        if version:
+            return version
+    return f"{identity[0]:x}-{identity[1]:x}"
+
+def load_ip_test_details(source, project=snapshot.DEFAULT_PROJECT, path=None):
+    if source == 'snapshot':
+        snapshot_dir = path or snapshot.current_dir(snapshot.project_dir(project))
+        read_sheet = lambda sheet: snapshot.read_sheet(sheet, snapshot_dir)
+    else:
+        xls = pd.ExcelFile(path or snapshot.excel_path(project))
+        read_sheet = lambda sheet: pd.read_excel(xls, sheet)
+
+    target_df = read_sheet('Target')
+    pass_df = read_sheet('Pass')
+    fail_df = read_sheet('Fail')
+    unresolved_df = read_sheet('Unresolved')
+
+    target_df['SheetType'] = 'Target'
+    pass_df['SheetType'] = 'Pass'
+    fail_df['SheetType'] = 'Fail'
+    unresolved_df['SheetType'] = 'Unresolved'
+
+    df = pd.concat([target_df, pass_df, fail_df], ignore_index=True)
+    return df, unresolved_df
+
+def build_module_summary(df):
+    df = df[df['Platform'].notna() & df['IP'].notna()]
+    counts = pd.DataFrame({
+        'Platform': df['Platform'],
+        'Interface': df['IP'],
+        'Target': (df['SheetType'] == 'Target').astype(int),
+        'Pass': (df['SheetType'] == 'Pass').astype(int),
+        'Fail': (df['SheetType'] == 'Fail').astype(int),
+        'Unresolved': (df['Resolution'] == 'Unresolved').astype(int),
+    }).groupby(['Platform', 'Interface'], sort=True).sum()
+    counts = counts[counts['Target'] > 0].reset_index()
+
+    summary = {platform: [] for platform in snapshot.PLATFORMS}
+    for platform, rows in counts.groupby('Platform', sort=False):
+        summary[platform] = rows.drop(columns='Platform').to_dict(orient='records')
+    return summary
+
+def normalize_ip(series):
+    return series.fillna('').str.strip().str.lower()
+
+def group_positions(mask, *keys):
+    rows = np.flatnonzero(mask)
+    groups = pd.Series(rows).groupby([key[rows] for key in keys]).indices
+    return {group: rows[positions] for group, positions in groups.items()}
+
+# Row positions keyed by (bucket, platform, normalized IP); platform None covers
+# every platform. 'unresolved' indexes the Unresolved sheet, all other buckets
+# index the concatenated Target/Pass/Fail frame.
+def build_testcase_index(df, unresolved_df):
+    platform = df['Platform'].to_numpy(dtype=object)
+    ip = normalize_ip(df['IP']).to_numpy(dtype=object)
+    filter_name = df['Filter'].fillna('').str.lower()
+    buckets = {
+        'all': np.ones(len(df), dtype=bool),
+        'target': (df['SheetType'] == 'Target').to_numpy(),
+        'pass': filter_name.str.contains('pass').to_numpy(),
+        'fail': filter_name.str.contains('fail').to_numpy(),
+        'resolution_unresolved': (df['Resolution'] == 'Unresolved').to_numpy(),
+    }
+    unresolved_platform = unresolved_df['Platform'].to_numpy(dtype=object)
+    unresolved_ip = normalize_ip(unresolved_df['IP']).to_numpy(dtype=object)
+    unresolved_all = np.ones(len(unresolved_df), dtype=bool)
+
+    index = {}
+    for bucket, mask in buckets.items():
+        for (plat, ip_key), rows in group_positions(mask, platform, ip).items():
+            index[(bucket, plat, ip_key)] = rows
+        for ip_key, rows in group_positions(mask, ip).items():
+            index[(bucket, None, ip_key)] = rows
+    for (plat, ip_key), rows in group_positions(unresolved_all, unresolved_platform, unresolved_ip).items():
+        index[('unresolved', plat, ip_key)] = rows
+    for ip_key, rows in group_positions(unresolved_all, unresolved_ip).items():
+        index[('unresolved', None, ip_key)] = rows
+
+    target_ips = {None: set(df.loc[buckets['target'], 'IP'])}
+    for plat, rows in df[buckets['target']].groupby('Platform')['IP']:
+        target_ips[plat] = set(rows)
+    return index, target_ips
+
+def encode_json_column(df, column):
+    if column not in df.columns:
+        return np.full(len(df), '""', dtype=object)
+    values = df[column]
+    text = values.astype(str).where(values.notna(), '')
+    return np.array([json.dumps(v) for v in text], dtype=object)
+
+# Fields a testcase response can be projected to (?fields=), and their sheet columns.
+CASE_FIELDS = {
+    'details': 'Summary',
+    'status': 'Status',
+    'issue_key': 'Issue Key',
+    'due_date': 'Due Date',
+    'resolution': 'Resolution',
+    'platform': 'Platform',
+    'ip': 'IP',
+    'filter': 'Filter',
+}
 
-    df = df[df['Platform'] == module_name]
-    target_ips = set(df[df['SheetType'] == 'Target']['IP'])
-    df = df[df['IP'].isin(target_ips)]
+# Per-frame columns needed by the testcase routes, with Summary/Status already
+# encoded as JSON string literals so responses are built without touching pandas.
+# The other projectable fields are kept raw and encoded per response, for the
+# rows being sent only.
+def build_case_columns(df):
+    return {
+        'ip': df['IP'].to_numpy(dtype=object),
+        'filter': df['Filter'].fillna('').str.lower().to_numpy(dtype=object),
+        'details': encode_json_column(df, 'Summary'),
+        'status': encode_json_column(df, 'Status'),
+        'raw': {
+            field: df[column].to_numpy(dtype=object) if column in df.columns else np.full(len(df), None, dtype=object)
+            for field, column in CASE_FIELDS.items()
+        },
+    }
+
+def encoded_field(columns, field, rows):
+    if field in ('details', 'status'):
+        return columns[field][rows]
+    return [json.dumps('' if pd.isna(v) else str(v)) for v in columns['raw'][field][rows]]
+
+def lookup_rows(snap, bucket, platform, interface):
+    rows = snap['testcase_index'].get((bucket, platform or None, interface.strip().lower()))
+    if rows is None:
+        return np.empty(0, dtype=np.intp)
+    return rows
+
+# Yields the comma-separated case objects; "no" numbers them from first_no.
+def iter_encoded_cases(columns, rows, fields=None, first_no=1):
+    for start in range(0, len(rows), STREAM_CHUNK_SIZE):
+        chunk_rows = rows[start:start + STREAM_CHUNK_SIZE]
+        numbers = range(first_no + start, first_no + start + len(chunk_rows))
+        if fields is None:
+            chunk = [
+                f'{{"details":{d},"no":"{no}","status":{st}}}'
+                for no, d, st in zip(numbers, columns['details'][chunk_rows], columns['status'][chunk_rows])
+            ]
+        else:
+            values = [encoded_field(columns, field, chunk_rows) for field in fields]
+            chunk = [
+                '{' + f'"no":"{no}"' + ''.join(f',"{field}":{value}' for field, value in zip(fields, item)) + '}'
+                for no, *item in zip(numbers, *values)
+            ]
+        yield (',' if start else '') + ','.join(chunk)
+
+def parse_fields(value):
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in CASE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+# Cursors are "<snapshot version>:<offset>", so a page is never taken from a
+# different snapshot than the one the client started paging through.
+def parse_cursor(cursor, version):
+    cursor_version, _, offset = cursor.rpartition(':')
+    if not offset.isdigit():
+        raise ValueError('Invalid cursor')
+    if cursor_version != version:
+        raise LookupError('Snapshot changed since this cursor was issued; start again without a cursor')
+    return int(offset)
+
+# Shared by every testcase endpoint: small results are sent in one body,
+# large ones are streamed chunk by chunk. Without limit/cursor/fields the
+# response is the plain case array; with any of them it is an envelope with the
+# total count and the cursor of the next page. Cases keep snapshot row order.
+def cases_response(columns, rows, snap):
+    args = request.args
+    paged = any(name in args for name in ('limit', 'cursor', 'fields'))
+    try:
+        fields = parse_fields(args['fields']) if 'fields' in args else None
+        offset = parse_cursor(args['cursor'], snap['version']) if args.get('cursor') else 0
+        limit = args.get('limit', type=int) if 'limit' in args else (DEFAULT_PAGE_SIZE if 'cursor' in args else None)
+        if 'limit' in args and (limit is None or limit < 1):
+            raise ValueError('limit must be a positive integer')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 409
+
+    total = len(rows)
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+        page = rows[offset:offset + limit]
+    else:
+        page = rows[offset:]
+    body = iter_encoded_cases(columns, page, fields, first_no=offset + 1)
+    if paged:
+        end = offset + len(page)
+        next_cursor = f"{snap['version']}:{end}" if end < total else None
+        head = '{' + f'"total":{total},"next_cursor":{json.dumps(next_cursor)},"items":['
+        body = itertools.chain([head], body, [']}\n'])
+    else:
+        body = itertools.chain(['['], body, [']\n'])
+    if len(page) <= STREAM_CASES_THRESHOLD:
+        body = ''.join(body)
+    return Response(body, mimetype='application/json')
+
+# One order-independent digest per platform over every row the dashboard shows for
+# it, so a new snapshot can say which platforms actually changed.
+def build_platform_digests(df, unresolved_df):
+    columns = [c for c in snapshot.COLUMNS if c in df.columns and c in unresolved_df.columns] + ['SheetType']
+    rows = pd.concat([df[columns], unresolved_df[columns]], ignore_index=True)
+    hashes = pd.util.hash_pandas_object(rows.astype(str), index=False).to_numpy()
+    platforms = rows['Platform'].to_numpy(dtype=object)
+    return {
+        platform: hashlib.sha1(np.sort(hashes[platforms == platform]).tobytes()).hexdigest()
+        for platform in snapshot.PLATFORMS
+    }
+
+def build_snapshot(source, project=snapshot.DEFAULT_PROJECT, path=None):
+    with metrics.timer('dashboard_snapshot_read_seconds', {'source': source}):
+        df, unresolved_df = load_ip_test_details(source, project, path)
+    testcase_index, target_ips = build_testcase_index(df, unresolved_df)
+    return {
+        'platform_digests': build_platform_digests(df, unresolved_df),
+        'ip_test_details': df,
+        'unresolved': unresolved_df,
+        'module_summary': build_module_summary(df),
+        'testcase_index': testcase_index,
+        'target_ips': target_ips,
+        'cases': {
+            'ip_test_details': build_case_columns(df),
+            'unresolved': build_case_columns(unresolved_df),
+        },
+    }
+
+def get_cached_snapshot(project=snapshot.DEFAULT_PROJECT):
+    data_cache, _ = get_data_cache(project)
+    with cache_lock:
+        snap = data_cache['snapshot']
+    if snap is None:
+        raise RuntimeError('Test case data unavailable and cache is empty')
+    return snap
+
+# Frames in the cache are shared between requests and must be treated as read-only.
+# The columnar snapshot written by prog.py is preferred; the project's workbook is
+# only read when no snapshot exists. Data is only reloaded when the source's
+# mtime/size/inode change, and only one thread per project loads at a time.
+# Derived tables are built once per load. A version that fails to load is not
+# retried, and the previous one keeps being served until a newer one appears.
+def get_snapshot(project=snapshot.DEFAULT_PROJECT):
+    if project not in snapshot.PROJECTS:
+        raise RuntimeError(f'Unknown project: {project}')
+    data_cache, reload_lock = get_data_cache(project)
+    try:
+        source, identity, path = get_snapshot_source(project)
+        key = (source,) + identity
+    except (FileNotFoundError, PermissionError):
+        metrics.inc('dashboard_snapshot_cache_requests_total', {'project': project, 'result': 'fallback'})
+        return get_cached_snapshot(project)
 
-    grouped = df.groupby('IP').agg(
-        Target=('SheetType', lambda x: (x == 'Target').sum()),
-        Pass=('SheetType', lambda x: (x == 'Pass').sum()),
-        Fail=('SheetType', lambda x: (x == 'Fail').sum()),
-        Unresolved=('Resolution', lambda x: (x == 'Unresolved').sum())
-    ).reset_index().rename(columns={'IP': 'Interface'})
+    with cache_lock:
+        if data_cache['key'] == key or (data_cache['failed_key'] == key and data_cache['snapshot'] is not None):
+            metrics.inc('dashboard_snapshot_cache_requests_total', {'project': project, 'result': 'hit'})
+            return data_cache['snapshot']
 
-    return jsonify(grouped.to_dict(orient='records'))
+    with reload_lock:
+        with cache_lock:
+            if data_cache['key'] == key or (data_cache['failed_key'] == key and data_cache['snapshot'] is not None):
+                metrics.inc('dashboard_snapshot_cache_requests_total', {'project': project, 'result': 'hit'})
+                return data_cache['snapshot']
+        metrics.inc('dashboard_snapshot_cache_requests_total', {'project': project, 'result': 'miss'})
+        try:
+            started = time.perf_counter()
+            snap = build_snapshot(source, project, path)
+            snap['version'] = get_snapshot_version(source, identity, path)
+            load_seconds = time.perf_counter() - started
+        except (FileNotFoundError, PermissionError):
+            metrics.inc('dashboard_snapshot_reload_errors_total', {'project': project, 'source': source})
+            return get_cached_snapshot(project)
+        except Exception as e:
+            metrics.inc('dashboard_snapshot_reload_errors_total', {'project': project, 'source': source})
+            with cache_lock:
+                data_cache['failed_key'] = key
+                previous = data_cache['snapshot']
+            if previous is None:
+                raise RuntimeError(str(e))
+            print(f"Could not load {source} for {project} ({e}); serving version {previous['version']}", file=sys.stderr)
+            return previous
+        metrics.inc('dashboard_snapshot_reloads_total', {'project': project, 'source': source})
+        metrics.observe('dashboard_snapshot_load_seconds', load_seconds, {'source': source})
 
-@app.route('/data/module_testcases/<interface>/<status>')
-def get_module_testcases(interface, status):
+        with cache_lock:
+            previous = data_cache['snapshot']
+            data_cache['key'] = key
+            data_cache['source'] = source
+            data_cache['version'] = snap['version']
+            data_cache['loaded_at'] = time.time()
+            data_cache['load_seconds'] = load_seconds
+            data_cache['snapshot'] = snap
+        publish_snapshot_event(project, previous, snap)
+    return snap
+
+snapshot_changed = Condition()
+snapshot_events = {}
+
+def publish_snapshot_event(project, previous, snap):
+    if previous is None:
+        changed = list(snapshot.PLATFORMS)
+    else:
+        changed = [
+            platform for platform in snapshot.PLATFORMS
+            if previous['platform_digests'].get(platform) != snap['platform_digests'].get(platform)
+        ]
+    with snapshot_changed:
+        snapshot_events[project] = {
+            'project': project,
+            'version': snap['version'],
+            'previous_version': None if previous is None else previous['version'],
+            'platforms': changed,
+        }
+        snapshot_changed.notify_all()
+
+watcher_lock = Lock()
+watcher_thread = None
+# project -> number of open event streams
+watched_projects = {}
+
+# Snapshots are only reloaded when a request asks for them, so while anyone is
+# listening for events one thread per process keeps checking the watched projects.
+# It exits once the last stream has closed; the next stream starts a new one.
+def snapshot_watcher():
+    global watcher_thread
+    while True:
+        time.sleep(EVENTS_POLL_SECONDS)
+        with watcher_lock:
+            projects = list(watched_projects)
+            if not projects:
+                watcher_thread = None
+                return
+        for project in projects:
+            try:
+                get_snapshot(project)
+            except RuntimeError:
+                pass
+            except Exception as e:
+                print(f"Checking for a new {project} snapshot failed: {e}", file=sys.stderr)
+
+def watch_project(project):
+    global watcher_thread
+    with watcher_lock:
+        watched_projects[project] = watched_projects.get(project, 0) + 1
+        if watcher_thread is None:
+            watcher_thread = Thread(target=snapshot_watcher, name='snapshot-watcher', daemon=True)
+            watcher_thread.start()
+
+def unwatch_project(project):
+    with watcher_lock:
+        watched_projects[project] -= 1
+        if not watched_projects[project]:
+            del watched_projects[project]
+
+def format_event(event):
+    return f"id: {event['version']}\nevent: snapshot\ndata: {json.dumps(event)}\n\n"
+
+# Sends an event whenever the project's live snapshot version differs from the one
+# the client last saw (Last-Event-ID on reconnect, or ?since= on first connect).
+# A client that missed intermediate versions is told every platform changed.
+# The project is watched from the first event until the stream is closed.
+def iter_snapshot_events(project, last_version):
+    deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+    watch_project(project)
     try:
-        df, unresolved_df, _ = get_ip_test_details_df()
-    except RuntimeError as e:
-        return jsonify({'error': str(e)}), 503
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            with snapshot_changed:
+                snapshot_changed.wait_for(
+                    lambda: snapshot_events.get(project, {}).get('version', last_version) != last_version,
+                    timeout=min(EVENTS_HEARTBEAT_SECONDS, max(0.0, deadline - time.monotonic())),
+                )
+                event = snapshot_events.get(project)
+            if event is None or event['version'] == last_version:
+                yield ': keep-alive\n\n'
+                continue
+            if event['previous_version'] != last_version and last_version is not None:
+                event = {**event, 'previous_version': last_version, 'platforms': list(snapshot.PLATFORMS)}
+            last_version = event['version']
+            yield format_event(event)
+    finally:
+        unwatch_project(project)
+
+def get_ip_test_details_df(project=snapshot.DEFAULT_PROJECT):
+    snap = get_snapshot(project)
+    return snap['ip_test_details'], snap['unresolved'], None
+
+def get_snapshot_info(project=snapshot.DEFAULT_PROJECT):
+    data_cache, _ = get_data_cache(project)
+    with cache_lock:
+        loaded_at = data_cache['loaded_at']
+        return {
+            'project': project,
+            'version': data_cache['version'],
+            'source': data_cache['source'],
+            'loaded_at': loaded_at,
+            'age_seconds': None if loaded_at is None else round(time.time() - loaded_at, 3),
+            'load_seconds': data_cache['load_seconds'],
+        }
+
+
+def data_etag(project, version):
+    args = sorted((k, v) for k, v in request.args.items(multi=True) if k not in ('t', 'v'))
+    raw = json.dumps([version, project, request.path, args])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+# Wraps the /data routes: the view gets the project's snapshot as `snap`, and the
+# response carries an ETag built from the snapshot version and the request, so a
+# matching If-None-Match is answered with 304 before the view runs. A URL stamped
+# with the current version (?v=) can be cached for good; anything else must be
+# revalidated.
+def snapshot_data(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if profiling.requested(request.headers):
+            return profiled_response(respond, *args, **kwargs)
+        return respond(*args, **kwargs)
+
+    def respond(*args, **kwargs):
+        project = request_project()
+        try:
+            snap = get_snapshot(project)
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 503
+
+        etag = data_etag(project, snap['version'])
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, snap=snap, **kwargs))
+        response.set_etag(etag)
+        response.headers['X-Snapshot-Version'] = snap['version']
+        if request.args.get('v') == snap['version']:
+            response.cache_control.public = True
+            response.cache_control.max_age = VERSIONED_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+# A request carrying the X-Profile-Token header is run under the profiler, with
+# a streamed body collected inside it so encoding is part of the profile. The
+# profile id is returned in X-Profile-Id; fetch it from /api/profiles/<id>.
+def profiled_response(respond, *args, **kwargs):
+    def run():
+        response = respond(*args, **kwargs)
+        response.get_data()
+        return response
+    try:
+        response, profile = profiling.profile_call(run)
+    except profiling.ProfilerBusyError as e:
+        response = respond(*args, **kwargs)
+        response.headers['X-Profile-Error'] = str(e)
+        return response
+    response.headers['X-Profile-Id'] = profiling.save(profile, f"{request.method} {request.full_path}")
+    return response
+
+@app.route('/data/summary')
+@snapshot_data
+def get_summary_data(snap):
+    return jsonify(snap['module_summary'])
 
-    platform = request.args.get('platform')
-    if platform:
-        df = df[df['Platform'] == platform]
-        unresolved_df = unresolved_df[unresolved_df['Platform'] == platform]
+@app.route('/data/<module_name>')
+@snapshot_data
+def get_module_data(module_name, snap):
+    return jsonify(snap['module_summary'].get(module_name, []))
 
-    target_ips = set(df[df['SheetType'] == 'Target']['IP'])
-    if interface not in target_ips:
-        return jsonify([])
+@app.route('/data/module_testcases/<interface>/<status>')
+@snapshot_data
+def get_module_testcases(interface, status, snap):
+    platform = request.args.get('platform') or None
+    if interface not in snap['target_ips'].get(platform, ()):
+        return cases_response(snap['cases']['ip_test_details'], np.empty(0, dtype=np.intp), snap)
 
     status_lower = status.lower()
     if status_lower == "unresolved":
-        filtered = unresolved_df[
-            (unresolved_df['IP'].fillna('').str.strip().str.lower() == interface.strip().lower())
-        ]
-    elif status_lower == "target":
-        filtered = df[
-            (df['IP'].fillna('').str.strip().str.lower() == interface.strip().lower()) &
-            (df['SheetType'] == 'Target')
-        ]
-    else:
-        filtered = df[
-            (df['IP'].fillna('').str.strip().str.lower() == interface.strip().lower()) &
-            (df['Filter'].fillna('').str.lower().str.contains(status_lower))
-        ]
+        return cases_response(snap['cases']['unresolved'], lookup_rows(snap, 'unresolved', platform, interface), snap)
 
-    cases = []
-    for idx, (_, row) in enumerate(filtered.iterrows(), 1):
-        details = row.get('Summary', '')
-        status_val = row.get('Status', '')
-        cases.append({
-            'no': str(idx),
-            'details': '' if pd.isna(details) else str(details),
-            'status': '' if pd.isna(status_val) else str(status_val)
-        })
-    return jsonify(cases)
+    columns = snap['cases']['ip_test_details']
+    if status_lower in ("target", "pass", "fail"):
+        rows = lookup_rows(snap, status_lower, platform, interface)
+    else:
+        rows = lookup_rows(snap, 'all', platform, interface)
+        rows = rows[pd.Series(columns['filter'][rows], dtype=object).str.contains(status_lower).to_numpy(dtype=bool)]
+    return cases_response(columns, rows, snap)
 
 @app.route('/data/module_testcases/<interface>')
-def get_all_testcases_for_ip(interface):
+@snapshot_data
+def get_all_testcases_for_ip(interface, snap):
+    columns = snap['cases']['ip_test_details']
+    rows = lookup_rows(snap, 'all', request.args.get('platform'), interface)
+    return cases_response(columns, rows[columns['ip'][rows] == interface], snap)
+
+@app.route('/events/snapshot')
+def snapshot_events_stream():
+    project = request_project()
     try:
-        df, _, _ = get_ip_test_details_df()
+        snap = get_snapshot(project)
     except RuntimeError as e:
         return jsonify({'error': str(e)}), 503
-    
-    platform = request.args.get('platform')
-    if platform:
-        df = df[df['Platform'] == platform]
-
-    filtered = df[df['IP'] == interface]
-    cases = []
-    for idx, (_, row) in enumerate(filtered.iterrows(), 1):
-        details = row.get('Summary', '')
-        status_val = row.get('Status', '')
-        cases.append({
-            'no': str(idx),
-            'details': '' if pd.isna(details) else str(details),
-            'status': '' if pd.isna(status_val) else str(status_val)
+    with snapshot_changed:
+        snapshot_events.setdefault(project, {
+            'project': project, 'version': snap['version'],
+            'previous_version': None, 'platforms': list(snapshot.PLATFORMS),
         })
-    return jsonify(cases)
+    last_version = request.headers.get('Last-Event-ID') or request.args.get('since') or None
+    response = Response(iter_snapshot_events(project, last_version), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/snapshot')
+def api_snapshot():
+    project = request_project()
+    try:
+        get_ip_test_details_df(project)
+    except RuntimeError as e:
+        return jsonify({'status': 'error', 'message': str(e), **get_snapshot_info(project)}), 503
+    return jsonify({'status': 'success', **get_snapshot_info(project)})
 
 @app.route('/')
 def index():
@@ -143,35 +640,128 @@ def static_files(path):
     return send_from_directory('../frontend', path)
 
 @app.route('/data/module_testcases/<interface>/Unresolved')
-def get_unresolved_testcases_for_ip(interface):
-    try:
-        df, unresolved_df, _ = get_ip_test_details_df()
-    except RuntimeError as e:
-        return jsonify({'error': str(e)}), 503
-    
-    platform = request.args.get('platform')
-    if platform:
-        df = df[df['Platform'] == platform]
-
-    filtered = df[(df['IP'] == interface) & (df['Resolution'] == 'Unresolved')]
-    cases = []
-    for idx, (_, row) in enumerate(filtered.iterrows(), 1):
-        details = row.get('Summary', '')
-        status_val = row.get('Status', '')
-        cases.append({
-            'no': str(idx),
-            'details': '' if pd.isna(details) else str(details),
-            'status': '' if pd.isna(status_val) else str(status_val)
-        })
-    return jsonify(cases)
+@snapshot_data
+def get_unresolved_testcases_for_ip(interface, snap):
+    columns = snap['cases']['ip_test_details']
+    rows = lookup_rows(snap, 'resolution_unresolved', request.args.get('platform'), interface)
+    return cases_response(columns, rows[columns['ip'][rows] == interface], snap)
+
+# Latency is taken when the response is closed, so streamed testcase and event
+# bodies are timed until their last chunk was sent. Routes are labelled by their
+# rule, e.g. /data/module_testcases/<interface>/<status>.
+@app.before_request
+def start_request_timer():
+    request.environ['dashboard.started'] = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get('dashboard.started')
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    labels = {'route': route, 'method': request.method, 'status': response.status_code}
+
+    def record():
+        metrics.inc('dashboard_http_requests_total', labels)
+        if started is not None:
+            metrics.observe('dashboard_http_request_duration_seconds', time.perf_counter() - started, {'route': route})
+    response.call_on_close(record)
+    return response
+
+def job_accepted(job_id):
+    return jsonify({"status": "accepted", "job_id": job_id}), 202
+
+refresh_lock = Lock()
+refresh_state = {
+    # (mode, sorted projects or None for all) -> {'job_id', 'trigger'}
+    'jobs': {},
+    'next_run_at': None,
+}
+
+def refresh_key(mode, projects):
+    return (mode if mode in ('full', 'incremental') else None,
+            tuple(sorted({p.upper() for p in projects})) if projects else None)
+
+# Callers asking for a refresh of the same projects in the same mode while one is
+# queued or running get that job id back, with whether it is being profiled. Any
+# other refresh is submitted as its own job; prog's refresh lock makes it wait for
+# the one in progress.
+def start_refresh(mode=None, trigger='manual', projects=None, profile=False):
+    key = refresh_key(mode, projects)
+    with refresh_lock:
+        entry = refresh_state['jobs'].get(key)
+        job = jobs.get_job(entry['job_id']) if entry else None
+        if job is not None and job['status'] in ('queued', 'running'):
+            return entry['job_id'], True, entry['profile']
+        kwargs = {'incremental': mode == 'incremental'} if key[0] else {}
+        if key[1]:
+            kwargs['projects'] = list(key[1])
+        job_id = jobs.submit('refresh-jira', prog.run_profiled if profile else prog.run, **kwargs)
+        refresh_state['jobs'] = {
+            k: e for k, e in refresh_state['jobs'].items() if jobs.get_job(e['job_id']) is not None
+        }
+        refresh_state['jobs'][key] = {'job_id': job_id, 'trigger': trigger, 'profile': profile}
+        return job_id, False, profile
+
+# The most recently submitted refresh that includes the project.
+def latest_refresh(project):
+    with refresh_lock:
+        entries = [
+            entry for (_, projects), entry in refresh_state['jobs'].items()
+            if (project in projects if projects else project in snapshot.PROJECTS)
+        ]
+    latest, trigger = None, None
+    for entry in entries:
+        job = jobs.get_job(entry['job_id'])
+        if job is not None and (latest is None or job['submitted_at'] > latest['submitted_at']):
+            latest, trigger = job, entry['trigger']
+    return latest, trigger
+
+def refresh_scheduler():
+    while True:
+        refresh_state['next_run_at'] = time.time() + REFRESH_INTERVAL_MINUTES * 60
+        time.sleep(REFRESH_INTERVAL_MINUTES * 60)
+        start_refresh(trigger='schedule')
+
+# Threads do not survive fork, so when gunicorn preloads the app the scheduler is
+# started in each worker by the post_fork hook instead of here.
+def start_background_threads():
+    if REFRESH_INTERVAL_MINUTES > 0:
+        Thread(target=refresh_scheduler, name='refresh-scheduler', daemon=True).start()
+
+if os.environ.get("APP_PRELOADED") != "1":
+    start_background_threads()
 
 @app.route('/refresh-jira', methods=['POST'])
 def refresh_jira():
+    projects = [p for p in request.args.get('project', '').upper().split(',') if p]
+    unknown = [p for p in projects if p not in snapshot.PROJECTS]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Unknown project: {', '.join(unknown)}"}), 400
+    profile = profiling.requested(request.headers)
+    job_id, attached, profiled = start_refresh(request.args.get('mode'), projects=projects, profile=profile)
+    body = {"status": "accepted", "job_id": job_id, "attached": attached}
+    if profile:
+        body["profiled"] = profiled
+        if not profiled:
+            body["message"] = "Attached to a refresh that is not being profiled; no profile will be produced."
+    return jsonify(body), 202
+
+@app.route('/refresh-jira/status')
+def refresh_jira_status():
+    project = request_project()
+    job, trigger = latest_refresh(project)
+    if job is not None:
+        job.pop('log', None)
     try:
-        subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), 'prog.py')], check=True)
-        return jsonify({"status": "Jira data refreshed!"})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        get_snapshot(project)
+    except RuntimeError:
+        pass
+    return jsonify({
+        'running': job is not None and job['status'] in ('queued', 'running'),
+        'trigger': trigger,
+        'job': job,
+        'next_run_at': refresh_state['next_run_at'],
+        'snapshot': get_snapshot_info(project),
+    })
 
 @app.route('/api/create-filter', methods=['POST'])
 def api_create_filter():
@@ -180,19 +770,8 @@ def api_create_filter():
     jql = data.get('jql')
     if not name or not jql:
         return jsonify({"status": "error", "message": "Filter name and JQL are required."}), 400
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'filters.py'), name, jql],
-            capture_output=True, text=True
-        )
-        print("filters.py stdout:", result.stdout)
-        print("filters.py stderr:", result.stderr)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": "Filter created/updated!"})
-        else:
-            return jsonify({"status": "error", "message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('create-filter', filters.create_or_update_filter, name, jql,
+                                    message="Filter created/updated!"))
 
 @app.route('/api/remove-issues', methods=['POST'])
 def api_remove_issues():
@@ -200,20 +779,7 @@ def api_remove_issues():
     identifier = data.get('filter_id') or data.get('issue_key')
     if not identifier:
         return jsonify({"status": "error", "message": "Filter ID or Issue Key is required."}), 400
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'filters.py'), '--remove', identifier],
-            capture_output=True, text=True
-        )
-        print("filters.py stdout:", result.stdout)
-        print("filters.py stderr:", result.stderr)
-        if result.returncode == 0:
-            msg = "Issue deleted!" if '-' in identifier else "All issues deleted!"
-            return jsonify({"status": "success", "message": msg})
-        else:
-            return jsonify({"status": "error", "message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('remove-issues', filters.remove_issues, identifier))
 
 @app.route('/api/add-role', methods=['POST'])
 def api_add_role():
@@ -224,19 +790,9 @@ def api_add_role():
     role_type = data.get('role_type') 
     if not filter_id or not project_key or not role_name or not role_type:
         return jsonify({"status": "error", "message": "All fields are required."}), 400
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'roles.py'), "add", role_type, filter_id, project_key, role_name],
-            capture_output=True, text=True
-        )
-        print("roles.py stdout:", result.stdout)
-        print("roles.py stderr:", result.stderr)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": f"{role_type.capitalize()} role added!"})
-        else:
-            return jsonify({"status": "error", "message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('add-role', roles.run, "add", filter_id, project_key,
+                                    role_type=role_type, role_name=role_name,
+                                    message=f"{role_type.capitalize()} role added!"))
 
 @app.route('/api/remove-role', methods=['POST'])
 def api_remove_role():
@@ -247,19 +803,9 @@ def api_remove_role():
     role_type = data.get('role_type') 
     if not filter_id or not project_key or not role_name or not role_type:
         return jsonify({"status": "error", "message": "All fields are required."}), 400
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'roles.py'), "remove", role_type, filter_id, project_key, role_name],
-            capture_output=True, text=True
-        )
-        print("roles.py stdout:", result.stdout)
-        print("roles.py stderr:", result.stderr)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": f"{role_type.capitalize()} role removed!"})
-        else:
-            return jsonify({"status": "error", "message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('remove-role', roles.run, "remove", filter_id, project_key,
+                                    role_type=role_type, role_name=role_name,
+                                    message=f"{role_type.capitalize()} role removed!"))
 
 @app.route('/api/remove-all-roles', methods=['POST'])
 def api_remove_all_roles():
@@ -268,79 +814,50 @@ def api_remove_all_roles():
     project_key = data.get('project_key')
     if not filter_id or not project_key:
         return jsonify({"status": "error", "message": "Filter ID and project key are required."}), 400
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'roles.py'), "remove-all", filter_id, project_key, "dummy"],
-            capture_output=True, text=True
-        )
-        print("roles.py stdout:", result.stdout)
-        print("roles.py stderr:", result.stderr)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": "All roles removed!"})
-        else:
-            return jsonify({"status": "error", "message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('remove-all-roles', roles.run, "remove-all", filter_id, project_key,
+                                    message="All roles removed!"))
 
 @app.route('/api/run-status', methods=['POST'])
 def api_run_status():
-    import subprocess
-    import sys
-    import os
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(os.path.dirname(__file__), 'status.py')],
-            capture_output=True, text=True
-        )
-        print("status.py stdout:", result.stdout)
-        print("status.py stderr:", result.stderr)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": "Status script executed successfully!"})
-        else:
-            return jsonify({"status": "error", "message": result.stderr or 'Status script failed.'}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return job_accepted(jobs.submit('run-status', status.process_txt_files,
+                                    message="Status script executed successfully!"))
+
+@app.route('/api/jobs')
+def api_jobs():
+    return jsonify(jobs.list_jobs())
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job)
 
 @app.route('/api/project-roles', methods=['POST'])
 def api_project_roles():
-    import requests, os
     data = request.get_json()
     project_key = data.get('project_key')
     if not project_key:
         return jsonify({"status": "error", "message": "Project key required."}), 400
 
-    JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
-    JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
-    JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
-    BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-    AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
-    HEADERS = {"Accept": "application/json"}
-
-    url = f"{BASE_URL}/project/{project_key}/role"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code != 200:
+    project_roles = metadata.get_project_roles(project_key)
+    if project_roles is None:
         return jsonify({"status": "error", "message": "Could not fetch roles."}), 500
 
-    roles = list(response.json().keys())
+    roles = list(project_roles.keys())
     return jsonify({"status": "success", "roles": roles})
 
 @app.route('/api/project-keys', methods=['GET'])
 def api_project_keys():
-    import requests, os
-    JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
-    JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
-    JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
-    BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-    AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
-    HEADERS = {"Accept": "application/json"}
-    url = f"{BASE_URL}/project/search"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code != 200:
+    project_keys = metadata.get_project_keys()
+    if project_keys is None:
         return jsonify({"status": "error", "message": "Could not fetch projects."}), 500
-    projects = response.json().get("values", [])
-    project_keys = [proj["key"] for proj in projects]
     return jsonify({"status": "success", "project_keys": project_keys})
 
+@app.route('/api/jira-stats')
+def api_jira_stats():
+    return jsonify(jira_client.get_stats())
+
 @app.route('/api/read-excel')
 def read_excel():
     df = pd.read_excel(excel_path)
@@ -352,5 +869,55 @@ def write_excel():
     df.to_excel(excel_path, index=False)
     return jsonify({"status": "success"})
     
+def warm_snapshots():
+    for project in snapshot.PROJECTS:
+        with startup.timed(f"preload snapshot {project}"):
+            try:
+                get_snapshot(project)
+            except RuntimeError as e:
+                print(f"Could not preload snapshot for {project}: {e}", file=sys.stderr)
+
+@app.route('/healthz')
+def healthz():
+    with cache_lock:
+        loaded = {project: cache['version'] for project, cache in data_caches.items() if cache['snapshot'] is not None}
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'started_at': startup.STARTED_AT,
+        'uptime_seconds': round(time.time() - startup.STARTED_AT, 3),
+        'preloaded': PRELOAD_SNAPSHOT,
+        'startup': startup.get_timings(),
+        'snapshots': loaded,
+    })
+
+@app.route('/api/profiles/<profile_id>')
+def api_profile(profile_id):
+    if not profiling.requested(request.headers):
+        return jsonify({"status": "error", "message": "Profiling token required."}), 403
+    kind = 'folded' if request.args.get('format') == 'folded' else 'txt'
+    try:
+        body = profiling.read(profile_id, kind)
+    except FileNotFoundError:
+        return jsonify({"status": "error", "message": "Unknown profile."}), 404
+    return Response(body, mimetype='text/plain')
+
+@app.route('/metrics')
+def prometheus_metrics():
+    with cache_lock:
+        loaded = {project: cache['loaded_at'] for project, cache in data_caches.items() if cache['loaded_at']}
+    now = time.time()
+    for project, loaded_at in loaded.items():
+        metrics.set_value('dashboard_snapshot_age_seconds', round(now - loaded_at, 3), {'project': project})
+    for result, count in metadata.get_stats().items():
+        if result in ('hits', 'misses', 'stale'):
+            metrics.set_value('dashboard_metadata_cache_requests_total', count, {'result': result})
+    metrics.set_value('dashboard_process_start_time_seconds', startup.STARTED_AT)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+startup.mark("app ready")
+if PRELOAD_SNAPSHOT:
+    warm_snapshots()
+
 if __name__ == '__main__':
     app.run(debug=True,use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Benchmarks for the dashboard routes and the Jira scripts, run against synthetic
+# snapshots and a local fake Jira so results only depend on this machine.
+#
+#   cd backend && python -m bench --sizes 1k,10k,100k
+#   python -m bench compare results/old.json results/new.json
+#
+# Backend modules read their paths and Jira URL at import time, so everything is
+# pointed at a scratch directory and the fake server before they are imported.
+
+def configure_environment(workdir, jira_url, projects=None):
+    if projects:
+        os.environ["JIRA_PROJECTS"] = ",".join(projects)
+    os.environ.update({
+        "JIRA_BASE_URL": jira_url,
+        "JIRA_EMAIL": "bench@example.invalid",
+        "JIRA_API_TOKEN": "bench",
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshot"),
+        "EXCEL_PATH": os.path.join(workdir, "data.xlsx"),
+        "SYNC_STATE_PATH": os.path.join(workdir, "sync_state.json"),
+        "REFRESH_LOCK_PATH": os.path.join(workdir, "refresh.lock"),
+        "FILTER_REGISTRY_PATH": os.path.join(workdir, "filter_registry.json"),
+        "ATTACHMENT_MANIFEST_PATH": os.path.join(workdir, "attachment_manifest.json"),
+        "EXPORT_XLSX": "0",
+        "REFRESH_INTERVAL_MINUTES": "0",
+        "APP_PRELOADED": "1",
+        "PRELOAD_SNAPSHOT": "0",
+    })
+
+def summarize(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "n": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+        "p50_ms": round(1000 * pick(0.50), 3),
+        "p90_ms": round(1000 * pick(0.90), 3),
+        "p99_ms": round(1000 * pick(0.99), 3),
+        "max_ms": round(1000 * ordered[-1], 3),
+    }
+
+def time_request(client, method, url, iterations, headers=None, json_body=None):
+    samples = []
+    status = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.open(url, method=method, headers=headers, json=json_body)
+        response.get_data()
+        samples.append(time.perf_counter() - started)
+        status = response.status_code
+        response.close()
+    return {"status": status, **summarize(samples)}
+
+def quietly():
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text in SIZES:
+        return SIZES[text]
+    return int(text)
+
+def size_label(issues):
+    for label, count in SIZES.items():
+        if count == issues:
+            return label
+    return str(issues)
+
+def project_for_size(issues):
+    return "B" + size_label(issues).upper()
+
+def bench_dataset(app, client, issues, args):
+    import snapshot
+    from bench import synthetic
+
+    project = project_for_size(issues)
+    write_xlsx = issues <= args.xlsx_max
+    started = time.perf_counter()
+    rows = synthetic.write_dataset(issues, project, write_xlsx=write_xlsx, seed=args.seed)
+    result = {"project": project, "rows": rows, "generate_seconds": round(time.perf_counter() - started, 3)}
+
+    loads = {"snapshot": []}
+    if write_xlsx:
+        loads["xlsx"] = []
+    for source, samples in loads.items():
+        for _ in range(args.load_repeats):
+            started = time.perf_counter()
+            app.build_snapshot(source, project)
+            samples.append(time.perf_counter() - started)
+    result["load"] = {source: summarize(samples) for source, samples in loads.items()}
+
+    started = time.perf_counter()
+    snap = app.get_snapshot(project)
+    result["first_get_snapshot_seconds"] = round(time.perf_counter() - started, 3)
+
+    platform_name = snapshot.PLATFORMS[0]
+    interface = snap['module_summary'][platform_name][0]['Interface']
+    q = f"project={project}"
+    routes = {
+        "summary": f"/data/summary?{q}",
+        "module": f"/data/{platform_name}?{q}",
+        "testcases_all": f"/data/module_testcases/{interface}?{q}",
+        "testcases_platform": f"/data/module_testcases/{interface}?{q}&platform={platform_name}",
+        "testcases_target": f"/data/module_testcases/{interface}/Target?{q}",
+        "testcases_pass": f"/data/module_testcases/{interface}/Pass?{q}",
+        "testcases_fail": f"/data/module_testcases/{interface}/Fail?{q}",
+        "testcases_unresolved": f"/data/module_testcases/{interface}/Unresolved?{q}",
+        "testcases_filter_substring": f"/data/module_testcases/{interface}/overall?{q}",
+        "testcases_page": f"/data/module_testcases/{interface}/Target?{q}&limit=200",
+        "testcases_fields": f"/data/module_testcases/{interface}/Target?{q}&fields=issue_key,status,due_date",
+        "api_snapshot": f"/api/snapshot?{q}",
+    }
+    timings = {}
+    for name, url in routes.items():
+        timings[name] = time_request(client, "GET", url, args.iterations)
+    for name in ("summary", "testcases_target"):
+        etag = client.get(routes[name]).headers.get("ETag")
+        timings[f"{name}_304"] = time_request(client, "GET", routes[name], args.iterations,
+                                              headers={"If-None-Match": etag})
+    result["routes"] = timings
+    return result
+
+def bench_routes(args):
+    import app as app_module
+
+    client = app_module.app.test_client()
+    results = {"sizes": {}}
+    for issues in args.sizes:
+        label = size_label(issues)
+        print(f"[bench] dataset {label}", file=sys.stderr)
+        results["sizes"][label] = bench_dataset(app_module, client, issues, args)
+
+    # Routes that do not depend on the dataset size; the Jira-backed ones are
+    # served from the metadata cache after the first call.
+    shared = {
+        "healthz": ("GET", "/healthz", None),
+        "metrics": ("GET", "/metrics", None),
+        "jira_stats": ("GET", "/api/jira-stats", None),
+        "jobs": ("GET", "/api/jobs", None),
+        "refresh_status": ("GET", "/refresh-jira/status", None),
+        "project_keys": ("GET", "/api/project-keys", None),
+        "project_roles": ("POST", "/api/project-roles", {"project_key": "BJ"}),
+    }
+    results["shared"] = {
+        name: time_request(client, method, url, args.iterations, json_body=body)
+        for name, (method, url, body) in shared.items()
+    }
+    return results
+
+def bench_jira(fake, args, workdir):
+    from bench import synthetic
+    import prog
+    import filters
+    import roles
+    import status
+
+    results = {}
+    sync_issues = synthetic.make_issues(args.jira_issues, "BJ", seed=args.seed)
+    fake.load_issues(sync_issues, "BJ")
+    print(f"[bench] full refresh of {args.jira_issues} issues", file=sys.stderr)
+    started = time.perf_counter()
+    with quietly():
+        prog.run(projects=["BJ"], incremental=False)
+    seconds = time.perf_counter() - started
+    results["refresh_full"] = {"issues": args.jira_issues, "seconds": round(seconds, 3),
+                               "issues_per_second": round(args.jira_issues / seconds, 1)}
+
+    # The incremental sync only pulls what changed since the full one, so its
+    # cost is reported per changed issue.
+    changed = min(args.churn, args.jira_issues)
+    fake.touch_issues(list(sync_issues["Issue Key"][:changed]), status="Fail")
+    print(f"[bench] incremental refresh of {changed} changed issues", file=sys.stderr)
+    started = time.perf_counter()
+    with quietly():
+        prog.run(projects=["BJ"], incremental=True)
+    seconds = time.perf_counter() - started
+    results["refresh_incremental"] = {"issues": args.jira_issues, "changed": changed, "seconds": round(seconds, 3),
+                                      "changed_per_second": round(changed / seconds, 1)}
+
+    delete_issues = synthetic.make_issues(args.delete_issues, "BD", seed=args.seed)
+    fake.load_issues(delete_issues, "BD")
+    print(f"[bench] deleting {args.delete_issues} issues", file=sys.stderr)
+    started = time.perf_counter()
+    with quietly():
+        summary = filters.bulk_delete(list(delete_issues["Issue Key"]), per_second=args.delete_rate)
+    seconds = time.perf_counter() - started
+    results["bulk_delete"] = {"issues": args.delete_issues, "deleted": summary["deleted_count"],
+                              "failed": summary["failed_count"], "seconds": round(seconds, 3),
+                              "issues_per_second": round(args.delete_issues / seconds, 1),
+                              "rate_limit_per_second": args.delete_rate}
+
+    upload_issues = synthetic.make_issues(args.upload_files, "BU", seed=args.seed)
+    fake.load_issues(upload_issues, "BU")
+    folder = os.path.join(workdir, "text_files")
+    os.makedirs(folder, exist_ok=True)
+    payload = b"x" * args.upload_bytes
+    for key, outcome in zip(upload_issues["Issue Key"], upload_issues["Status"]):
+        with open(os.path.join(folder, f"{key}_{'Fail' if outcome == 'Fail' else 'Pass'}.txt"), "wb") as f:
+            f.write(payload)
+    for run in ("first", "unchanged"):
+        print(f"[bench] status upload ({run}) of {args.upload_files} files", file=sys.stderr)
+        started = time.perf_counter()
+        with quietly():
+            outcome = status.process_txt_files(folder)
+        seconds = time.perf_counter() - started
+        results[f"status_upload_{run}"] = {"files": args.upload_files, "ok": outcome["counts"]["ok"],
+                                           "failed": outcome["counts"]["failed"], "seconds": round(seconds, 3),
+                                           "files_per_second": round(args.upload_files / seconds, 1),
+                                           "bytes_per_file": args.upload_bytes}
+
+    filter_id = fake.new_id()
+    fake.filters[filter_id] = {"id": filter_id, "name": "bench_permissions", "jql": "project = BJ"}
+    fake.add_permissions(filter_id, args.permissions)
+    print(f"[bench] removing {args.permissions} filter permissions", file=sys.stderr)
+    started = time.perf_counter()
+    with quietly():
+        roles.run("remove-all", filter_id, "BJ")
+    seconds = time.perf_counter() - started
+    results["remove_all_permissions"] = {"permissions": args.permissions, "left": len(fake.permissions[filter_id]),
+                                         "seconds": round(seconds, 3),
+                                         "permissions_per_second": round(args.permissions / seconds, 1)}
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    from bench.fake_jira import FakeJira
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    fake = FakeJira(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                    retry_after=args.retry_after, seed=args.seed)
+    # The app only serves configured projects: the Jira benchmarks' BJ and one per dataset.
+    args.sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    configure_environment(workdir, fake.start(), ["BJ"] + [project_for_size(issues) for issues in args.sizes])
+
+    result = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "command"},
+        },
+    }
+    try:
+        fake.projects.setdefault("BJ", fake.new_id())
+        if not args.skip_routes:
+            result["routes"] = bench_routes(args)
+        if not args.skip_jira:
+            result["jira"] = bench_jira(fake, args, workdir)
+        import jira_client
+        result["jira_calls"] = {"fake_server": dict(fake.calls), "throttled": fake.throttled,
+                                "client": jira_client.get_stats()}
+    finally:
+        fake.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("bench-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=1, sort_keys=True)
+    print(f"Results written to {out}")
+    return result
+
+# Leaf metrics as "a.b.c" -> value, for the timing and throughput keys only.
+def flatten(tree, prefix=""):
+    metrics = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and (key.endswith(("_ms", "seconds", "_per_second"))):
+            metrics[name] = value
+    return metrics
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = flatten({k: v for k, v in json.load(f).items() if k in ("routes", "jira")})
+    with open(args.candidate) as f:
+        candidate = flatten({k: v for k, v in json.load(f).items() if k in ("routes", "jira")})
+
+    regressions = 0
+    print(f"{'metric':<72} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name], candidate[name]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if name.endswith("_per_second") else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSED"
+            regressions += 1
+        elif worse < -args.threshold:
+            flag = "  improved"
+        if flag or args.all:
+            print(f"{name:<72} {before:>12g} {after:>12g} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Dashboard and Jira script benchmarks.")
+    sub = parser.add_subparsers(dest="command")
+
+    cmp_parser = sub.add_parser("compare", help="compare two result files")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("candidate")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported (default 0.10)")
+    cmp_parser.add_argument("--all", action="store_true", help="print every metric, not just changes")
+
+    parser.add_argument("--sizes", default="1k,10k,100k",
+                        help="dataset sizes in issues: 1k,10k,100k,1m or plain numbers")
+    parser.add_argument("--iterations", type=int, default=30, help="requests per route")
+    parser.add_argument("--load-repeats", type=int, default=3, help="cold loads per source")
+    parser.add_argument("--xlsx-max", type=int, default=10_000, help="largest dataset also written as xlsx")
+    parser.add_argument("--jira-issues", type=int, default=2000, help="issues synced by the refresh benchmark")
+    parser.add_argument("--churn", type=int, default=100, help="issues changed before the incremental refresh")
+    parser.add_argument("--delete-issues", type=int, default=200)
+    parser.add_argument("--delete-rate", type=float, default=0, help="bulk delete rate limit, 0 for none")
+    parser.add_argument("--upload-files", type=int, default=100)
+    parser.add_argument("--upload-bytes", type=int, default=20_000)
+    parser.add_argument("--permissions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Jira seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per request")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-jira", action="store_true")
+    parser.add_argument("--workdir", help="keep generated data here instead of a temp dir")
+    parser.add_argument("--out", help="result file (default bench/results/bench-<timestamp>.json)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        return compare(args)
+    run(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
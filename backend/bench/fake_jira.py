@@ -0,0 +1,280 @@
+import re
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+API_PREFIX = "/rest/api/3"
+TRANSITIONS = {"11": "To Do", "21": "In Progress", "31": "Pass", "41": "Fail"}
+ROLES = {"Viewers": "10100", "Developers": "10101", "Administrators": "10102"}
+# Loaded issues were last updated this long ago, outside any incremental window.
+LOADED_AGE_SECONDS = 7 * 24 * 3600
+
+# A stand-in for the parts of the Jira REST API this app uses, held in memory.
+# Every request waits `latency` seconds (plus up to `jitter`), and a `rate_429`
+# fraction of requests are answered 429 with a Retry-After of `retry_after`.
+class FakeJira:
+    def __init__(self, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=0.1, page_limit=100, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.page_limit = page_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.issues = {}
+        self.projects = {}
+        self.filters = {}
+        self.permissions = {}
+        self.next_id = 10000
+        self.version = 0
+        self.search_cache = {}
+        self.calls = Counter()
+        self.throttled = 0
+        self.server = None
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return str(self.next_id)
+
+    def load_issues(self, issues_df, project_key):
+        self.projects.setdefault(project_key, self.new_id())
+        columns = ["Issue Key", "Summary", "Status", "Platform", "IP", "Due Date"]
+        with self.lock:
+            for key, summary, status, platform, ip, due in zip(*(issues_df[c] for c in columns)):
+                self.issues[key] = {
+                    "project": project_key,
+                    "summary": summary,
+                    "status": status,
+                    "platform": platform,
+                    "ip": ip,
+                    "duedate": None if due == "Not Set" else due,
+                    "attachments": [],
+                    "updated": time.time() - LOADED_AGE_SECONDS,
+                }
+            self.version += 1
+
+    # Marks issues as just updated (e.g. to simulate churn between two syncs),
+    # optionally moving them to another status.
+    def touch_issues(self, keys, status=None):
+        with self.lock:
+            for key in keys:
+                issue = self.issues[key]
+                issue["updated"] = time.time()
+                if status is not None:
+                    issue["status"] = status
+            self.version += 1
+
+    def add_permissions(self, filter_id, count):
+        with self.lock:
+            perms = self.permissions.setdefault(str(filter_id), [])
+            for i in range(count):
+                self.next_id += 1
+                perms.append({"id": self.next_id, "type": "group", "group": {"name": f"group-{i}"}})
+
+    # JQL support is limited to what the app generates: a project clause,
+    # optional status clauses and a relative `updated >= "-Nm"`, with anything
+    # else (e.g. ORDER BY) ignored. Results are cached until an issue is changed
+    # (and, for relative clauses, for a second), so paging stays cheap.
+    def search(self, jql):
+        project = re.search(r'project\s*=\s*"?([A-Z][A-Z0-9_]*)"?', jql)
+        statuses = set(re.findall(r'status\s*=\s*"([^"]+)"', jql))
+        updated = re.search(r'updated\s*>=\s*"?-(\d+)m"?', jql)
+        now = time.time()
+        with self.lock:
+            cached = self.search_cache.get(jql)
+            if cached is not None and cached[0] == self.version and (updated is None or now - cached[2] < 1):
+                return cached[1]
+            since = now - int(updated.group(1)) * 60 if updated else None
+            matches = [
+                (key, issue) for key, issue in self.issues.items()
+                if (project is None or issue["project"] == project.group(1))
+                and (not statuses or issue["status"] in statuses)
+                and (since is None or issue["updated"] >= since)
+            ]
+            self.search_cache[jql] = (self.version, matches, now)
+            return matches
+
+    def issue_json(self, key, issue):
+        return {
+            "key": key,
+            "fields": {
+                "summary": issue["summary"],
+                "status": {"name": issue["status"]},
+                "duedate": issue["duedate"],
+                "resolution": {"name": "Done"} if issue["status"] in ("Pass", "Fail") else None,
+                "labels": [issue["platform"], issue["ip"]],
+                "issuetype": {"id": "1"},
+                "project": {"id": self.projects.get(issue["project"]), "key": issue["project"]},
+                "attachment": list(issue["attachments"]),
+            },
+        }
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, code, body=None, headers=None):
+                data = b"" if body is None else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def handle_any(self, method):
+                url = urlparse(self.path)
+                path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+                body = self.read_body()
+                template = re.sub(r"/[A-Z][A-Z0-9_]*-\d+", "/{issue}", path)
+                template = re.sub(r"/project/(?!search)[^/]+", "/project/{project}", template)
+                template = re.sub(r"/\d+", "/{id}", template)
+                with fake.lock:
+                    fake.calls[f"{method} {template}"] += 1
+                delay = fake.latency + (fake.random.random() * fake.jitter if fake.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                if fake.rate_429 and fake.random.random() < fake.rate_429:
+                    with fake.lock:
+                        fake.throttled += 1
+                    return self.send(429, {"errorMessages": ["Rate limited"]}, {"Retry-After": str(fake.retry_after)})
+                code, payload = fake.route(method, path, parse_qs(url.query), body, self.headers)
+                self.send(code, payload)
+
+            def do_GET(self):
+                self.handle_any("GET")
+
+            def do_POST(self):
+                self.handle_any("POST")
+
+            def do_PUT(self):
+                self.handle_any("PUT")
+
+            def do_DELETE(self):
+                self.handle_any("DELETE")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-jira", daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}{API_PREFIX}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def route(self, method, path, query, body, headers):
+        arg = lambda name, default=None: query.get(name, [default])[0]
+        payload = json.loads(body) if body and headers.get("Content-Type", "").startswith("application/json") else {}
+
+        if method == "GET" and path == "/search":
+            matches = self.search(arg("jql", ""))
+            start = int(arg("startAt", "0"))
+            size = min(int(arg("maxResults", "50")), self.page_limit)
+            page = [self.issue_json(key, issue) for key, issue in matches[start:start + size]]
+            return 200, {"startAt": start, "maxResults": size, "total": len(matches), "issues": page}
+
+        if method == "GET" and path == "/project/search":
+            return 200, {"values": [{"id": pid, "key": key} for key, pid in self.projects.items()]}
+        m = re.fullmatch(r"/project/([^/]+)(/statuses|/role)?", path)
+        if method == "GET" and m:
+            if m.group(1) not in self.projects:
+                return 404, {"errorMessages": ["No project"]}
+            if m.group(2) == "/statuses":
+                return 200, [{"id": "1", "statuses": [{"name": name} for name in TRANSITIONS.values()]}]
+            if m.group(2) == "/role":
+                return 200, {name: f"https://jira.invalid/role/{rid}" for name, rid in ROLES.items()}
+            return 200, {"id": self.projects[m.group(1)], "key": m.group(1)}
+
+        if path == "/filter/search" and method == "GET":
+            name = arg("filterName", "")
+            return 200, {"values": [f for f in self.filters.values() if name.lower() in f["name"].lower()]}
+        if path == "/filter" and method == "POST":
+            if any(f["name"] == payload.get("name") for f in self.filters.values()):
+                return 400, {"errorMessages": ["A filter with this name already exists"]}
+            filter_id = self.new_id()
+            self.filters[filter_id] = {"id": filter_id, "name": payload.get("name"), "jql": payload.get("jql")}
+            return 201, self.filters[filter_id]
+        m = re.fullmatch(r"/filter/(\d+)", path)
+        if m:
+            found = self.filters.get(m.group(1))
+            if found is None:
+                return 404, {"errorMessages": ["No filter"]}
+            if method == "PUT":
+                found.update({k: v for k, v in payload.items() if k in ("name", "jql")})
+            return 200, found
+        m = re.fullmatch(r"/filter/(\d+)/permission(?:/(\d+))?", path)
+        if m:
+            with self.lock:
+                perms = self.permissions.setdefault(m.group(1), [])
+                if method == "GET":
+                    return 200, list(perms)
+                if method == "POST":
+                    self.next_id += 1
+                    perms.append({"id": self.next_id, "type": "project", "project": {"id": str(payload.get("projectId"))},
+                                  "role": {"id": str(payload.get("projectRoleId"))}})
+                    return 201, perms
+                if method == "DELETE":
+                    before = len(perms)
+                    perms[:] = [p for p in perms if str(p["id"]) != m.group(2)]
+                    return (204, None) if len(perms) < before else (404, {"errorMessages": ["No permission"]})
+
+        m = re.fullmatch(r"/issue/([A-Z][A-Z0-9_]*-\d+)(/transitions|/attachments)?", path)
+        if m:
+            key, sub = m.groups()
+            with self.lock:
+                issue = self.issues.get(key)
+                if issue is None:
+                    return 404, {"errorMessages": ["Issue does not exist"]}
+                if sub is None and method == "GET":
+                    return 200, self.issue_json(key, issue)
+                if sub is None and method == "DELETE":
+                    del self.issues[key]
+                    self.version += 1
+                    return 204, None
+                if sub == "/transitions" and method == "GET":
+                    return 200, {"transitions": [{"id": tid, "to": {"name": name}} for tid, name in TRANSITIONS.items()]}
+                if sub == "/transitions" and method == "POST":
+                    target = TRANSITIONS.get(str(payload.get("transition", {}).get("id")))
+                    if target is None:
+                        return 400, {"errorMessages": ["Invalid transition"]}
+                    issue["status"] = target
+                    issue["updated"] = time.time()
+                    self.version += 1
+                    return 204, None
+                if sub == "/attachments" and method == "POST":
+                    filename = re.search(rb'filename="([^"]*)"', body)
+                    content = body.split(b"\r\n\r\n", 1)[-1].rsplit(b"\r\n--", 1)[0]
+                    self.next_id += 1
+                    attachment = {"id": str(self.next_id), "filename": filename.group(1).decode() if filename else "file",
+                                  "size": len(content)}
+                    issue["attachments"].append(attachment)
+                    issue["updated"] = time.time()
+                    return 200, [attachment]
+
+        m = re.fullmatch(r"/attachment/(\d+)", path)
+        if m and method == "DELETE":
+            with self.lock:
+                for issue in self.issues.values():
+                    kept = [a for a in issue["attachments"] if a["id"] != m.group(1)]
+                    if len(kept) != len(issue["attachments"]):
+                        issue["attachments"] = kept
+                        return 204, None
+            return 404, {"errorMessages": ["No attachment"]}
+
+        return 404, {"errorMessages": [f"Not handled by the fake Jira: {method} {path}"]}
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import snapshot
+
+OUTCOMES = ["Pass", "Fail", "To Do", "In Progress"]
+OUTCOME_WEIGHTS = [0.45, 0.2, 0.2, 0.15]
+# Issues spread evenly over the four platforms, each platform with its own set of
+# interfaces. Status decides which of the Pass/Fail/Unresolved sheets an issue is
+# in besides Target, the same way the overall_status_filter_* filters do.
+def make_issues(issues, project_key="BENCH", interfaces_per_platform=60, seed=0):
+    rng = np.random.default_rng(seed)
+    numbers = np.arange(1, issues + 1)
+    platforms = np.array(snapshot.PLATFORMS, dtype=object)[rng.integers(0, len(snapshot.PLATFORMS), issues)]
+    interface_ids = rng.integers(0, interfaces_per_platform, issues)
+    ips = np.array([f"IP{i:03d}" for i in range(interfaces_per_platform)], dtype=object)[interface_ids]
+    outcomes = np.array(OUTCOMES, dtype=object)[rng.choice(len(OUTCOMES), issues, p=OUTCOME_WEIGHTS)]
+    due = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, issues), unit="D")
+    due = np.where(rng.random(issues) < 0.2, "Not Set", due.strftime("%Y-%m-%d").to_numpy(dtype=object))
+    return pd.DataFrame({
+        "Issue Key": [f"{project_key}-{n}" for n in numbers],
+        "Summary": [f"{ip} {platform} test case {n}" for ip, platform, n in zip(ips, platforms, numbers)],
+        "Platform": platforms,
+        "IP": ips,
+        "Status": outcomes,
+        "Due Date": due,
+        "Resolution": np.where(np.isin(outcomes, ["Pass", "Fail"]), "Done", "Unresolved"),
+    })
+
+def frames_from_issues(issues_df):
+    sheets = {
+        "Target": issues_df,
+        "Pass": issues_df[issues_df["Status"] == "Pass"],
+        "Fail": issues_df[issues_df["Status"] == "Fail"],
+        "Unresolved": issues_df[issues_df["Status"].isin(["To Do", "In Progress"])],
+    }
+    frames = {}
+    for sheet, df in sheets.items():
+        df = df.reset_index(drop=True).copy()
+        df.insert(1, "Filter", f"overall_status_filter_{sheet}")
+        frames[sheet] = df[snapshot.COLUMNS]
+    return frames
+
+def write_dataset(issues, project_key, write_xlsx=False, seed=0):
+    frames = frames_from_issues(make_issues(issues, project_key, seed=seed))
+    rows = snapshot.write_snapshot(frames, snapshot.project_dir(project_key))
+    if write_xlsx:
+        snapshot.write_excel_export(frames, snapshot.excel_path(project_key))
+    return rows
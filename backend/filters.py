@@ -1,68 +1,64 @@
 import sys
 import os
 import requests
-from dotenv import load_dotenv
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+import jira_client
+import metadata
+import jobs
 
-load_dotenv()
+BASE_URL = jira_client.BASE_URL
 
-JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
-JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
-JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
-BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
-HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+DELETE_WORKERS = int(os.environ.get("DELETE_WORKERS", "8"))
+DELETE_RATE_PER_SECOND = float(os.environ.get("DELETE_RATE_PER_SECOND", "10"))
 
 def get_filter_by_name(name):
-    url = f"{BASE_URL}/filter/search?filterName={name}"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code == 200:
-        filters = response.json().get("values", [])
-        for f in filters:
-            if f["name"] == name:
-                return f
+    for f in metadata.search_filters(name) or []:
+        if f["name"] == name:
+            return f
     return None
 
 def get_filter_jql_by_id(filter_id):
     url = f"{BASE_URL}/filter/{filter_id}"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
+    response = jira_client.get(url)
     if response.status_code == 200:
         return response.json().get("jql")
     return None
 
+# Any search page that still fails after jira_client's retries fails the whole
+# lookup; deleting only the pages that happened to load would look like success.
 def get_issues_for_jql(jql):
-    url = f"{BASE_URL}/search"
-    params = {"jql": jql, "maxResults": 1000}
-    response = requests.get(url, params=params, auth=AUTH, headers=HEADERS)
-    if response.status_code == 200:
-        return [issue["key"] for issue in response.json().get("issues", [])]
-    return []
+    try:
+        return [issue["key"] for issue in jira_client.iter_search_issues(jql, fields="key")]
+    except requests.RequestException as e:
+        raise RuntimeError(f"Searching the filter's issues failed: {e}")
 
 def delete_issue(issue_key):
     url = f"{BASE_URL}/issue/{issue_key}"
-    response = requests.delete(url, auth=AUTH, headers=HEADERS)
+    response = jira_client.delete(url)
     return response.status_code == 204
 
 def create_filter(name, jql):
     url = f"{BASE_URL}/filter"
     payload = {"name": name, "jql": jql, "favourite": False}
-    response = requests.post(url, json=payload, auth=AUTH, headers=HEADERS)
+    response = jira_client.post(url, json=payload)
+    metadata.invalidate_filters()
     if response.status_code == 201 or response.status_code == 200:
         print("Filter created!")
         return True
     else:
-        print("Failed to create filter:", response.status_code, response.text, file=sys.stderr)
-        sys.exit(1)
+        raise RuntimeError(f"Failed to create filter: {response.status_code} {response.text}")
 
 def update_filter_jql(filter_id, new_jql):
     url = f"{BASE_URL}/filter/{filter_id}"
     payload = {"jql": new_jql}
-    response = requests.put(url, json=payload, auth=AUTH, headers=HEADERS)
+    response = jira_client.put(url, json=payload)
+    metadata.invalidate_filters()
     if response.status_code == 200:
         print("Filter JQL updated!")
         return True
     else:
-        print("Failed to update filter:", response.status_code, response.text, file=sys.stderr)
-        return False
+        raise RuntimeError(f"Failed to update filter: {response.status_code} {response.text}")
 
 def create_or_update_filter(name, jql):
     existing = get_filter_by_name(name)
@@ -71,46 +67,86 @@ def create_or_update_filter(name, jql):
     else:
         return create_filter(name, jql)
 
-if __name__ == "__main__":
-    if '--remove' in sys.argv:
-        identifier = sys.argv[sys.argv.index('--remove') + 1]
-        if identifier.isdigit():
-            filter_id = identifier
-        elif '-' not in identifier:
-            filter_obj = get_filter_by_name(identifier)
-            if not filter_obj:
-                print(f"Filter with name '{identifier}' not found.", file=sys.stderr)
-                sys.exit(1)
-            filter_id = str(filter_obj["id"])
-        elif '-' in identifier:
-            issue_key = identifier
-            if delete_issue(issue_key):
-                print(f"Deleted {issue_key}")
-                sys.exit(0)
-            else:
-                print(f"Failed to delete {issue_key}", file=sys.stderr)
-                sys.exit(1)
-        else:
-            print("Invalid identifier for deletion. Provide a filter ID, filter name, or issue key (e.g., PROJ-123).", file=sys.stderr)
-            sys.exit(1)
-
-        jql = get_filter_jql_by_id(filter_id)
-        if not jql:
-            print("Could not retrieve JQL for filter", file=sys.stderr)
-            sys.exit(1)
-        issues = get_issues_for_jql(jql)
-        print(f"Found {len(issues)} issues to delete.")
-        for key in issues:
-            if delete_issue(key):
-                print(f"Deleted {key}")
+# Deletes on a bounded pool under a shared rate limit; 429s and 5xx are retried by
+# jira_client. An issue that is already gone (404) counts as skipped.
+def bulk_delete(issue_keys, max_workers=DELETE_WORKERS, per_second=DELETE_RATE_PER_SECOND):
+    limiter = jira_client.RateLimiter(per_second)
+    summary = {"deleted": [], "failed": {}, "skipped": []}
+    summary_lock = Lock()
+
+    def delete_one(key):
+        limiter.wait()
+        try:
+            response = jira_client.delete(f"{BASE_URL}/issue/{key}")
+            outcome = {204: "deleted", 404: "skipped"}.get(response.status_code, "failed")
+            detail = f"{response.status_code} {response.text}".strip()
+        except requests.RequestException as e:
+            outcome, detail = "failed", str(e)
+        with summary_lock:
+            if outcome == "failed":
+                summary["failed"][key] = detail
+                print(f"Failed to delete {key}: {detail}", file=sys.stderr)
             else:
-                print(f"Failed to delete {key}", file=sys.stderr)
-        print("Done.")
-        sys.exit(0)
-    elif len(sys.argv) >= 3:
-        name = sys.argv[1]
-        jql = sys.argv[2]
-        create_or_update_filter(name, jql)
+                summary[outcome].append(key)
+                print(f"Deleted {key}" if outcome == "deleted" else f"Skipped {key} (not found)")
+            done = len(summary["deleted"]) + len(summary["failed"]) + len(summary["skipped"])
+        jobs.set_progress(done, len(issue_keys))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(jobs.in_current_job(delete_one), issue_keys))
+
+    return {
+        "total": len(issue_keys),
+        "deleted_count": len(summary["deleted"]),
+        "failed_count": len(summary["failed"]),
+        "skipped_count": len(summary["skipped"]),
+        "deleted": summary["deleted"],
+        "failed": summary["failed"],
+        "skipped": summary["skipped"],
+    }
+
+def remove_issues(identifier):
+    if identifier.isdigit():
+        filter_id = identifier
+    elif '-' not in identifier:
+        filter_obj = get_filter_by_name(identifier)
+        if not filter_obj:
+            raise RuntimeError(f"Filter with name '{identifier}' not found.")
+        filter_id = str(filter_obj["id"])
+    else:
+        if delete_issue(identifier):
+            print(f"Deleted {identifier}")
+            return "Issue deleted!"
+        raise RuntimeError(f"Failed to delete {identifier}")
+
+    jql = get_filter_jql_by_id(filter_id)
+    if not jql:
+        raise RuntimeError("Could not retrieve JQL for filter")
+    issues = get_issues_for_jql(jql)
+    print(f"Found {len(issues)} issues to delete.")
+    summary = bulk_delete(issues)
+    print("Done.")
+    # The job still succeeds so the per-issue lists are kept; "status" tells the
+    # page that some deletes failed.
+    if summary["failed_count"]:
+        summary["status"] = "error"
+        summary["message"] = (f"Deleted {summary['deleted_count']} of {summary['total']} issues, "
+                              f"{summary['failed_count']} failed.")
     else:
-        print("Name and JQL required", file=sys.stderr)
-        sys.exit(1)
\ No newline at end of file
+        summary["status"] = "success"
+        summary["message"] = "All issues deleted!"
+    return summary
+
+if __name__ == "__main__":
+    try:
+        if '--remove' in sys.argv:
+            result = remove_issues(sys.argv[sys.argv.index('--remove') + 1])
+            if isinstance(result, dict) and result["failed_count"]:
+                raise RuntimeError(result["message"])
+        elif len(sys.argv) >= 3:
+            create_or_update_filter(sys.argv[1], sys.argv[2])
+        else:
+            raise RuntimeError("Name and JQL required")
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,204 @@
+import os
+import re
+import time
+import email.utils
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
+JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
+JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
+
+BASE_URL = os.environ.get("JIRA_BASE_URL") or f"https://{JIRA_DOMAIN}/rest/api/3"
+AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
+HEADERS = {"Accept": "application/json"}
+
+CONNECT_TIMEOUT = float(os.environ.get("JIRA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("JIRA_READ_TIMEOUT", "60"))
+POOL_SIZE = int(os.environ.get("JIRA_POOL_SIZE", "20"))
+MAX_RETRIES = int(os.environ.get("JIRA_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.environ.get("JIRA_BACKOFF_SECONDS", "0.5"))
+MAX_BACKOFF_SECONDS = float(os.environ.get("JIRA_MAX_BACKOFF_SECONDS", "30"))
+
+SEARCH_PAGE_SIZE = int(os.environ.get("JIRA_SEARCH_PAGE_SIZE", "100"))
+SEARCH_WORKERS = int(os.environ.get("JIRA_SEARCH_WORKERS", "4"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+session = requests.Session()
+session.auth = AUTH
+session.headers.update(HEADERS)
+adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+stats = {}
+stats_lock = Lock()
+
+def endpoint_name(method, url):
+    path = url.split("?", 1)[0]
+    if path.startswith(BASE_URL):
+        path = path[len(BASE_URL):]
+    path = re.sub(r"/project/(?!search(?:/|$))[^/]+", "/project/{project}", path)
+    path = re.sub(r"/[A-Z][A-Z0-9_]*-\d+(?=/|$)", "/{issue}", path)
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", path)
+    return f"{method} {path}"
+
+def record(endpoint, status, seconds, is_retry):
+    with stats_lock:
+        entry = stats.setdefault(endpoint, {
+            "count": 0, "errors": 0, "retries": 0,
+            "total_seconds": 0.0, "max_seconds": 0.0, "status": {},
+        })
+        entry["count"] += 1
+        entry["retries"] += int(is_retry)
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+        if status == "error" or status >= 400:
+            entry["errors"] += 1
+    metrics.inc("dashboard_jira_requests_total", {"endpoint": endpoint, "status": status})
+    metrics.observe("dashboard_jira_request_duration_seconds", seconds, {"endpoint": endpoint})
+    if is_retry:
+        metrics.inc("dashboard_jira_retries_total", {"endpoint": endpoint})
+
+def get_stats():
+    with stats_lock:
+        return {
+            endpoint: {**entry, "status": dict(entry["status"]),
+                       "avg_seconds": entry["total_seconds"] / entry["count"] if entry["count"] else 0.0}
+            for endpoint, entry in stats.items()
+        }
+
+# Spaces calls out evenly so a pool of workers stays under a requests-per-second budget.
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        time.sleep(at - now)
+
+def retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+            return min(max(parsed.timestamp() - time.time(), 0.0), MAX_BACKOFF_SECONDS)
+    return min(BACKOFF_SECONDS * (2 ** attempt), MAX_BACKOFF_SECONDS)
+
+# Every Jira call goes through here so connections are pooled and kept alive.
+# 429s are retried for any method, since Jira did not process the request;
+# 5xx and connection errors only for idempotent methods. A body that is read as it
+# is sent (an open file) cannot be replayed: pass make_body instead, a callable
+# returning a fresh (data, headers) for every attempt (closed after it), or
+# retries=0.
+def request(method, url, retries=None, make_body=None, **kwargs):
+    method = method.upper()
+    if not url.startswith("http"):
+        url = BASE_URL + url
+    if retries is None:
+        retries = 0 if "files" in kwargs else MAX_RETRIES
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    endpoint = endpoint_name(method, url)
+
+    attempt = 0
+    while True:
+        attempt_kwargs, body = kwargs, None
+        if make_body is not None:
+            body, headers = make_body()
+            attempt_kwargs = {**kwargs, "data": body, "headers": {**kwargs.get("headers", {}), **headers}}
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **attempt_kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            record(endpoint, "error", time.perf_counter() - started, attempt > 0)
+            if method not in IDEMPOTENT_METHODS or attempt >= retries:
+                raise
+            time.sleep(retry_delay(None, attempt))
+            attempt += 1
+            continue
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        record(endpoint, response.status_code, time.perf_counter() - started, attempt > 0)
+
+        retryable = response.status_code == 429 or (
+            response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+        )
+        if not retryable or attempt >= retries:
+            return response
+        time.sleep(retry_delay(response, attempt))
+        attempt += 1
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+def search_page(jql, start_at, max_results, fields=None):
+    params = {"jql": jql, "startAt": start_at, "maxResults": max_results}
+    if fields:
+        params["fields"] = fields
+    response = get("/search", params=params)
+    response.raise_for_status()
+    return response.json()
+
+# The first page tells us the total; the remaining pages are fetched on a bounded
+# pool and yielded in startAt order. Jira may return fewer issues than requested,
+# so the page size actually served by the first page is used for the offsets.
+# Offsets are only stable with a fixed order, so JQL without an ORDER BY is sorted
+# by key. Issues that move between pages while paging can still be served twice,
+# so each key is only yielded once.
+def iter_search_issues(jql, fields=None, page_size=SEARCH_PAGE_SIZE, max_workers=SEARCH_WORKERS):
+    if not re.search(r"\bORDER\s+BY\b", jql, flags=re.IGNORECASE):
+        jql = f"{jql} ORDER BY key"
+    seen = set()
+
+    def unseen(issues):
+        for issue in issues:
+            if issue.get("key") in seen:
+                continue
+            seen.add(issue.get("key"))
+            yield issue
+
+    first = search_page(jql, 0, page_size, fields)
+    issues = first.get("issues", [])
+    yield from unseen(issues)
+
+    total = first.get("total", len(issues))
+    step = len(issues)
+    if not step or step >= total:
+        return
+
+    starts = range(step, total, step)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pages = executor.map(lambda start: search_page(jql, start, step, fields), starts)
+        for page in pages:
+            yield from unseen(page.get("issues", []))
+
+def search_issues(jql, fields=None, page_size=SEARCH_PAGE_SIZE, max_workers=SEARCH_WORKERS):
+    return list(iter_search_issues(jql, fields, page_size, max_workers))
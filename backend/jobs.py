@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+MAX_JOBS = int(os.environ.get("MAX_JOBS", "200"))
+MAX_LOG_CHARS = int(os.environ.get("MAX_JOB_LOG_CHARS", "200000"))
+
+executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+jobs = OrderedDict()
+jobs_lock = threading.Lock()
+current = threading.local()
+
+# print() from a job thread is appended to that job's log as well as the real stream,
+# so the scripts keep working unchanged whether they run as a job or from the CLI.
+class JobOutput:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        job = getattr(current, "job", None)
+        if job is not None:
+            with jobs_lock:
+                job["log"] = (job["log"] + text)[-MAX_LOG_CHARS:]
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+if not isinstance(sys.stdout, JobOutput):
+    sys.stdout = JobOutput(sys.stdout)
+if not isinstance(sys.stderr, JobOutput):
+    sys.stderr = JobOutput(sys.stderr)
+
+def set_progress(done, total=None, message=None):
+    job = getattr(current, "job", None)
+    if job is None:
+        return
+    with jobs_lock:
+        job["progress"] = {"done": done, "total": total}
+        if message is not None:
+            job["progress"]["message"] = message
+
+# Pools started inside a job run their work on other threads; wrapping the worker
+# function keeps its output and progress attached to the job.
+def in_current_job(func):
+    job = getattr(current, "job", None)
+
+    def wrapper(*args, **kwargs):
+        previous = getattr(current, "job", None)
+        current.job = job
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current.job = previous
+    return wrapper
+
+def public_view(job):
+    return dict(job)
+
+def run_job(job, func, args, kwargs, message):
+    current.job = job
+    with jobs_lock:
+        job["status"] = "running"
+        job["started_at"] = time.time()
+    try:
+        result = func(*args, **kwargs)
+        with jobs_lock:
+            job["status"] = "succeeded"
+            job["result"] = result
+            if isinstance(result, str):
+                job["message"] = result
+            elif isinstance(result, dict) and "message" in result:
+                job["message"] = result["message"]
+            else:
+                job["message"] = message
+    except (Exception, SystemExit) as e:
+        print(traceback.format_exc(), file=sys.stderr)
+        with jobs_lock:
+            job["status"] = "failed"
+            job["error"] = str(e) or e.__class__.__name__
+    finally:
+        with jobs_lock:
+            job["finished_at"] = time.time()
+        metrics.observe("dashboard_job_duration_seconds", job["finished_at"] - job["started_at"],
+                        {"job": job["name"], "status": job["status"]})
+        current.job = None
+
+def prune_jobs():
+    finished = [job_id for job_id, job in jobs.items() if job["status"] in ("succeeded", "failed")]
+    for job_id in finished[:max(0, len(jobs) - MAX_JOBS)]:
+        del jobs[job_id]
+
+def submit(name, func, *args, message=None, **kwargs):
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "name": name,
+        "status": "queued",
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "progress": None,
+        "message": None,
+        "result": None,
+        "error": None,
+        "log": "",
+    }
+    with jobs_lock:
+        jobs[job_id] = job
+        prune_jobs()
+    executor.submit(run_job, job, func, args, kwargs, message)
+    return job_id
+
+def get_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        return None if job is None else public_view(job)
+
+def list_jobs():
+    with jobs_lock:
+        return [
+            {key: value for key, value in public_view(job).items() if key != "log"}
+            for job in reversed(jobs.values())
+        ]
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import threading
+import jira_client
+
+# Seconds each kind of lookup is served from memory before it is refreshed.
+TTLS = {
+    "project_keys": float(os.environ.get("METADATA_TTL_PROJECT_KEYS", "3600")),
+    "project_id": float(os.environ.get("METADATA_TTL_PROJECT_ID", "86400")),
+    "project_roles": float(os.environ.get("METADATA_TTL_PROJECT_ROLES", "3600")),
+    "filters": float(os.environ.get("METADATA_TTL_FILTERS", "600")),
+}
+# An expired entry younger than this is still returned while a background refresh
+# runs; older entries are fetched before returning.
+MAX_STALE_SECONDS = float(os.environ.get("METADATA_MAX_STALE_SECONDS", "604800"))
+
+entries = {}
+entries_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "stale": 0, "refresh_errors": 0}
+
+def load_entry(kind, key, loader, entry):
+    with entry["lock"]:
+        if entry["fetched_at"] is not None and time.time() - entry["fetched_at"] < TTLS[kind]:
+            return entry["value"]
+        value = loader(key)
+        if value is not None:
+            entry["value"] = value
+            entry["fetched_at"] = time.time()
+        return value
+
+def refresh_in_background(kind, key, loader, entry):
+    def refresh():
+        try:
+            load_entry(kind, key, loader, entry)
+        except Exception as e:
+            with entries_lock:
+                stats["refresh_errors"] += 1
+            print(f"[WARN] Refreshing {kind} {key!r} failed: {e}", file=sys.stderr)
+        finally:
+            with entries_lock:
+                entry["refreshing"] = False
+
+    threading.Thread(target=refresh, name=f"metadata-{kind}", daemon=True).start()
+
+# Values are cached only when the loader returns something other than None, so
+# failed or empty lookups are retried on the next call.
+def cached(kind, key, loader):
+    with entries_lock:
+        entry = entries.setdefault((kind, key), {
+            "value": None, "fetched_at": None, "refreshing": False, "lock": threading.Lock(),
+        })
+        age = None if entry["fetched_at"] is None else time.time() - entry["fetched_at"]
+        if age is not None and age < TTLS[kind]:
+            stats["hits"] += 1
+            return entry["value"]
+        if age is not None and age < TTLS[kind] + MAX_STALE_SECONDS:
+            stats["stale"] += 1
+            start_refresh = not entry["refreshing"]
+            entry["refreshing"] = True
+            value = entry["value"]
+        else:
+            stats["misses"] += 1
+            start_refresh = None
+    if start_refresh is None:
+        return load_entry(kind, key, loader, entry)
+    if start_refresh:
+        refresh_in_background(kind, key, loader, entry)
+    return value
+
+def invalidate(kind, key=None):
+    with entries_lock:
+        for entry_kind, entry_key in list(entries):
+            if entry_kind == kind and (key is None or entry_key == key):
+                del entries[(entry_kind, entry_key)]
+
+def get_stats():
+    with entries_lock:
+        return {**stats, "entries": len(entries)}
+
+def fetch_project_keys(_key):
+    response = jira_client.get("/project/search")
+    if response.status_code != 200:
+        print(f"[ERROR] Project search failed: {response.status_code} - {response.text}")
+        return None
+    return [proj["key"] for proj in response.json().get("values", [])]
+
+def fetch_project_id(project_key):
+    response = jira_client.get(f"/project/{project_key}")
+    if response.status_code != 200:
+        print(f"[ERROR] Project ID fetch failed: {response.status_code} - {response.text}")
+        return None
+    return response.json().get("id")
+
+def fetch_project_roles(project_key):
+    response = jira_client.get(f"/project/{project_key}/role")
+    if response.status_code != 200:
+        print(f"[ERROR] Roles fetch failed: {response.status_code} - {response.text}")
+        return None
+    return {name: link.rstrip("/").split("/")[-1] for name, link in response.json().items()}
+
+def fetch_filters(filter_name):
+    response = jira_client.get("/filter/search", params={"filterName": filter_name})
+    if response.status_code != 200:
+        print(f"[ERROR] Filter search failed: {response.status_code} - {response.text}")
+        return None
+    return response.json().get("values", [])
+
+def get_project_keys():
+    return cached("project_keys", None, fetch_project_keys)
+
+def get_project_id(project_key):
+    return cached("project_id", project_key, fetch_project_id)
+
+# Role name -> role id for a project.
+def get_project_roles(project_key):
+    return cached("project_roles", project_key, fetch_project_roles)
+
+# The filters Jira returns when searching for this name; callers pick the match.
+def search_filters(filter_name):
+    return cached("filters", filter_name, fetch_filters)
+
+# Any filter search may include a filter we just created, renamed or re-shared.
+def invalidate_filters():
+    invalidate("filters")
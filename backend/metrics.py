@@ -0,0 +1,123 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# Counters and histograms kept in memory and rendered in the Prometheus text
+# exposition format by GET /metrics. Values are per process: every gunicorn
+# worker keeps its own, and each series carries no worker label, so scrape the
+# workers individually (or run one worker) when exact totals matter.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# name -> (type, help, buckets); only these names can be recorded.
+DEFINITIONS = {
+    "dashboard_http_request_duration_seconds": (
+        "histogram", "Time from request start until the response body was sent, by route.", LATENCY_BUCKETS),
+    "dashboard_http_requests_total": (
+        "counter", "Requests served, by route, method and status code.", None),
+    "dashboard_snapshot_cache_requests_total": (
+        "counter", "Snapshot lookups, by project and result (hit, miss, fallback).", None),
+    "dashboard_snapshot_reloads_total": (
+        "counter", "Snapshots loaded from disk, by project and source (snapshot, xlsx).", None),
+    "dashboard_snapshot_reload_errors_total": (
+        "counter", "Snapshot loads that failed, by project and source.", None),
+    "dashboard_snapshot_read_seconds": (
+        "histogram", "Time spent reading the sheets of a snapshot or workbook, by source.", LOAD_BUCKETS),
+    "dashboard_snapshot_load_seconds": (
+        "histogram", "Time spent reading and indexing a snapshot or workbook, by source.", LOAD_BUCKETS),
+    "dashboard_job_duration_seconds": (
+        "histogram", "Background job run time, by job name and final status.", LOAD_BUCKETS),
+    "dashboard_jira_requests_total": (
+        "counter", "Outbound Jira requests, by endpoint (method and path) and status code, 'error' when no response came back.", None),
+    "dashboard_jira_request_duration_seconds": (
+        "histogram", "Outbound Jira request latency, by endpoint.", LATENCY_BUCKETS),
+    "dashboard_jira_retries_total": (
+        "counter", "Outbound Jira requests that were retries, by endpoint.", None),
+    "dashboard_metadata_cache_requests_total": (
+        "counter", "Jira metadata cache lookups, by result (hits, misses, stale).", None),
+    "dashboard_snapshot_age_seconds": (
+        "gauge", "Seconds since the served snapshot was loaded, by project.", None),
+    "dashboard_process_start_time_seconds": (
+        "gauge", "Unix time the process started.", None),
+}
+
+values = {}
+values_lock = threading.Lock()
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in (labels or {}).items()))
+
+def inc(name, labels=None, value=1):
+    key = label_key(labels)
+    with values_lock:
+        series = values.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+def set_value(name, value, labels=None):
+    with values_lock:
+        values.setdefault(name, {})[label_key(labels)] = value
+
+def observe(name, seconds, labels=None):
+    buckets = DEFINITIONS[name][2]
+    key = label_key(labels)
+    with values_lock:
+        series = values.setdefault(name, {})
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                entry["buckets"][i] += 1
+        entry["sum"] += seconds
+        entry["count"] += 1
+
+@contextmanager
+def timer(name, labels=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, labels)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+def render():
+    with values_lock:
+        current = {
+            name: {key: (dict(entry, buckets=list(entry["buckets"])) if isinstance(entry, dict) else entry)
+                   for key, entry in series.items()}
+            for name, series in values.items()
+        }
+    lines = []
+    for name, (kind, help_text, buckets) in DEFINITIONS.items():
+        series = current.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, entry in sorted(series.items()):
+            if kind != "histogram":
+                lines.append(f"{name}{format_labels(key)} {format_value(entry)}")
+                continue
+            for bound, count in zip(buckets, entry["buckets"]):
+                lines.append(f"{name}_bucket{format_labels(key, [('le', format_value(float(bound)))])} {count}")
+            lines.append(f"{name}_bucket{format_labels(key, [('le', '+Inf')])} {entry['count']}")
+            lines.append(f"{name}_sum{format_labels(key)} {format_value(entry['sum'])}")
+            lines.append(f"{name}_count{format_labels(key)} {entry['count']}")
+    return "\n".join(lines) + "\n"
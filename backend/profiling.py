@@ -0,0 +1,129 @@
+import os
+import io
+import re
+import sys
+import time
+import hmac
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Profiling is off unless a token is configured; a request is profiled when it
+# carries the token in the X-Profile-Token header.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(BASE_DIR, "profiles")
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "40"))
+PROFILE_SAMPLE_SECONDS = float(os.environ.get("PROFILE_SAMPLE_SECONDS", "0.002"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+
+def requested(headers):
+    token = headers.get("X-Profile-Token")
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# Samples the stacks of the given threads (all threads but itself when None) every
+# `interval` seconds and counts them in the folded "outer;...;inner" form read by
+# flamegraph.pl and speedscope.
+class StackSampler:
+    def __init__(self, thread_ids=None, interval=PROFILE_SAMPLE_SECONDS):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, name="profile-sampler", daemon=True)
+
+    def sample(self):
+        names = {}
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.thread.ident or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+profile_lock = threading.Lock()
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+# Runs func under cProfile (the calling thread) and the stack sampler. With
+# all_threads the sampler also covers pool threads started by func, which
+# cProfile does not see. Returns func's result and the profile. Only one profile
+# runs at a time per process, since the interpreter allows a single profiler.
+def profile_call(func, *args, all_threads=False, **kwargs):
+    if not profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Another profile is already running")
+    try:
+        profiler = cProfile.Profile()
+        sampler = StackSampler(None if all_threads else {threading.get_ident()})
+        started = time.perf_counter()
+        with sampler:
+            profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.disable()
+    finally:
+        profile_lock.release()
+    return result, {"seconds": time.perf_counter() - started, "profiler": profiler, "sampler": sampler}
+
+def top_functions(profile, top=PROFILE_TOP):
+    out = io.StringIO()
+    out.write(f"Wall time: {profile['seconds']:.3f}s\n")
+    pstats.Stats(profile["profiler"], stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+def prune(keep=PROFILE_KEEP):
+    reports = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".txt"))
+    for name in reports[:max(0, len(reports) - keep)]:
+        for suffix in (".txt", ".folded", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name[:-len(".txt")] + suffix))
+            except FileNotFoundError:
+                pass
+
+# Writes <id>.txt (top functions by cumulative time), <id>.folded (sampled stacks)
+# and <id>.prof (raw pstats, for snakeviz and the like) and returns the id.
+def save(profile, label):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}-" + \
+        re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")[:80]
+    base = os.path.join(PROFILE_DIR, profile_id)
+    with open(base + ".txt", "w") as f:
+        f.write(f"{label}\n{top_functions(profile)}")
+    with open(base + ".folded", "w") as f:
+        f.write(profile["sampler"].folded())
+    profile["profiler"].dump_stats(base + ".prof")
+    prune()
+    return profile_id
+
+def is_profile_id(profile_id):
+    return re.fullmatch(r"[A-Za-z0-9_.-]+", profile_id or "") is not None and not profile_id.startswith(".")
+
+def read(profile_id, kind="txt"):
+    if not is_profile_id(profile_id) or kind not in ("txt", "folded"):
+        raise FileNotFoundError(profile_id)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.{kind}")) as f:
+        return f.read()
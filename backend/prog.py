@@ -1,25 +1,49 @@
 import os
+import re
+import sys
+import json
+import math
+import time
 import requests
-import pandas as pd
-from requests.auth import HTTPBasicAuth
-from dotenv import load_dotenv
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from startup import lazy_import
+import snapshot
+import profiling
+import jira_client
+import metadata
+import jobs
 
-load_dotenv()
+pd = lazy_import("pandas")
 
-JIRA_DOMAIN = os.environ["JIRA_DOMAIN"]
-JIRA_EMAIL = os.environ["JIRA_EMAIL"]
-JIRA_API_TOKEN = os.environ["JIRA_API_TOKEN"]
-
-PLATFORMS = {"JTAMP", "JTAES", "JTAEN", "SVB"}
+PLATFORMS = set(snapshot.PLATFORMS)
 STATUSES = {"TARGET", "PASS", "FAIL", "UNRESOLVED"}
 
-BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
-HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+BASE_URL = jira_client.BASE_URL
+
+EXPORT_XLSX = os.environ.get("EXPORT_XLSX", "1") != "0"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SYNC_STATE_PATH = os.environ.get("SYNC_STATE_PATH") or os.path.join(BASE_DIR, "sync_state.json")
+REFRESH_LOCK_PATH = os.environ.get("REFRESH_LOCK_PATH") or os.path.join(BASE_DIR, "refresh.lock")
+FILTER_REGISTRY_PATH = os.environ.get("FILTER_REGISTRY_PATH") or os.path.join(BASE_DIR, "filter_registry.json")
+FILTER_REGISTRY_MAX_AGE_HOURS = float(os.environ.get("FILTER_REGISTRY_MAX_AGE_HOURS", "168"))
+PROJECT_KEY = snapshot.DEFAULT_PROJECT
+PROJECTS = snapshot.PROJECTS
+PROJECT_WORKERS = int(os.environ.get("PROJECT_WORKERS", "4"))
+SYNC_MODE = os.environ.get("SYNC_MODE", "full")
+SYNC_OVERLAP_MINUTES = int(os.environ.get("SYNC_OVERLAP_MINUTES", "5"))
+FULL_SYNC_INTERVAL_HOURS = float(os.environ.get("FULL_SYNC_INTERVAL_HOURS", "24"))
+
+state_lock = Lock()
 
 def get_project_statuses(project_key):
     url = f"{BASE_URL}/project/{project_key}/statuses"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
+    response = jira_client.get(url)
     response.raise_for_status()
     statuses = []
     for issue_type in response.json():
@@ -29,7 +53,7 @@ def get_project_statuses(project_key):
 
 def find_filter_id_by_name(filter_name):
     url = f"{BASE_URL}/filter/search?filterName={filter_name}"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
+    response = jira_client.get(url)
     if response.status_code == 200:
         filters = response.json().get("values", [])
         for f in filters:
@@ -45,8 +69,9 @@ def create_filter(filter_name, jql, description=""):
         "description": description,
         "favourite": False
     }
-    response = requests.post(url, json=payload, auth=AUTH, headers=HEADERS)
-    
+    response = jira_client.post(url, json=payload)
+    metadata.invalidate_filters()
+
     if response.status_code == 201:
         return response.json().get("id")
     elif response.status_code == 400 and "A filter with this name already exists" in response.text:
@@ -58,7 +83,32 @@ def create_filter(filter_name, jql, description=""):
             return existing_id
         return None
 
-def ensure_selected_status_filters(project_key):
+def get_filter(filter_id):
+    response = jira_client.get(f"{BASE_URL}/filter/{filter_id}")
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+def resolve_filter(filter_name, jql, description):
+    filter_id = find_filter_id_by_name(filter_name)
+    if not filter_id:
+        filter_id = create_filter(filter_name, jql, description=description)
+        print(f"Created filter '{filter_name}' with ID {filter_id}")
+        if not filter_id:
+            return None
+        return {"id": str(filter_id), "name": filter_name, "jql": jql}
+    print(f"Filter '{filter_name}' already exists with ID {filter_id}")
+    existing = get_filter(filter_id) or {}
+    return {"id": str(filter_id), "name": filter_name, "jql": existing.get("jql") or jql}
+
+# Jira filter names are unique per owner, so projects other than the default one
+# get their own suffixed set of filters.
+def status_filter_name(project_key, sheet):
+    if project_key == PROJECT_KEY:
+        return f"overall_status_filter_{sheet}"
+    return f"overall_status_filter_{sheet}_{project_key}"
+
+def discover_status_filters(project_key):
     statuses = get_project_statuses(project_key)
     status_map = {
         "Pass": "Pass",
@@ -66,82 +116,124 @@ def ensure_selected_status_filters(project_key):
         "Target": None,  
         "Unresolved": ["To Do", "In Progress"] 
     }
-    filter_ids = {}
-
-    filter_name = "overall_status_filter_Target"
-    jql = f'project = "{project_key}"'
-    filter_id = find_filter_id_by_name(filter_name)
-    if not filter_id:
-        filter_id = create_filter(
-            filter_name,
-            jql,
-            description="Auto-created filter for all issues (Target)"
-        )
-        print(f"Created filter '{filter_name}' with ID {filter_id}")
-    else:
-        print(f"Filter '{filter_name}' already exists with ID {filter_id}")
-    filter_ids["Target"] = filter_id
+    filters = {}
 
+    filters["Target"] = resolve_filter(
+        status_filter_name(project_key, "Target"),
+        f'project = "{project_key}"',
+        "Auto-created filter for all issues (Target)"
+    )
 
     for key in ["Pass", "Fail"]:
         if status_map[key] in statuses:
-            filter_name = f"overall_status_filter_{key}"
-            jql = f'project = "{project_key}" AND status = "{status_map[key]}"'
-            filter_id = find_filter_id_by_name(filter_name)
-            if not filter_id:
-                filter_id = create_filter(
-                    filter_name,
-                    jql,
-                    description=f"Auto-created filter for status '{status_map[key]}'"
-                )
-                print(f"Created filter '{filter_name}' with ID {filter_id}")
-            else:
-                print(f"Filter '{filter_name}' already exists with ID {filter_id}")
-            filter_ids[key] = filter_id
+            filters[key] = resolve_filter(
+                status_filter_name(project_key, key),
+                f'project = "{project_key}" AND status = "{status_map[key]}"',
+                f"Auto-created filter for status '{status_map[key]}'"
+            )
         else:
-            print(f"Status '{status_map[key]}' not found in project.")
+            print(f"Status '{status_map[key]}' not found in project {project_key}.")
 
     unresolved_statuses = [s for s in status_map["Unresolved"] if s in statuses]
     if unresolved_statuses:
-        filter_name = "overall_status_filter_Unresolved"
         status_jql = " OR ".join([f'status = "{s}"' for s in unresolved_statuses])
-        jql = f'project = "{project_key}" AND ({status_jql})'
-        filter_id = find_filter_id_by_name(filter_name)
-        if not filter_id:
-            filter_id = create_filter(
-                filter_name,
-                jql,
-                description=f"Auto-created filter for unresolved statuses: {', '.join(unresolved_statuses)}"
-            )
-            print(f"Created filter '{filter_name}' with ID {filter_id}")
-        else:
-            print(f"Filter '{filter_name}' already exists with ID {filter_id}")
-        filter_ids["Unresolved"] = filter_id
+        filters["Unresolved"] = resolve_filter(
+            status_filter_name(project_key, "Unresolved"),
+            f'project = "{project_key}" AND ({status_jql})',
+            f"Auto-created filter for unresolved statuses: {', '.join(unresolved_statuses)}"
+        )
     else:
-        print("No unresolved statuses found in project.")
-
-    return filter_ids
-
-def fetch_issues_for_filter(filter_id):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/filter/{filter_id}"
-    headers = {"Accept": "application/json"}
-    filter_response = requests.get(url, headers=headers, auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN))
-    if filter_response.status_code != 200:
-        print(f"Failed to fetch filter {filter_id}")
-        return []
-    filter_data = filter_response.json()
-    jql_query = filter_data["jql"]
-
-    search_url = f"https://{JIRA_DOMAIN}/rest/api/3/search"
-    params = {
-        "jql": jql_query,
-        "maxResults": 100,
-        "fields": "summary,status,duedate,resolution,labels"
-    }
-    response = requests.get(search_url, headers=headers, params=params, auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN))
-    data = response.json()
+        print(f"No unresolved statuses found in project {project_key}.")
+
+    # A sheet is only left out when the project has no such status. A filter that
+    # could not be found or created fails the sync rather than being registered
+    # (and reused for FILTER_REGISTRY_MAX_AGE_HOURS) as an empty sheet.
+    missing = [key for key, info in filters.items() if not info]
+    if missing:
+        raise RuntimeError(f"Could not find or create the {', '.join(missing)} filter(s) for project {project_key}")
+    return filters
+
+def load_filter_registry():
+    try:
+        with open(FILTER_REGISTRY_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_filter_registry(registry):
+    with open(FILTER_REGISTRY_PATH + ".tmp", "w") as f:
+        json.dump(registry, f, indent=1)
+    os.replace(FILTER_REGISTRY_PATH + ".tmp", FILTER_REGISTRY_PATH)
+
+# The filters (id, name, JQL) for each sheet are remembered per project, so a
+# refresh goes straight to the issue search. They are looked up again when the
+# entry is older than FILTER_REGISTRY_MAX_AGE_HOURS, when refresh=True, or after a
+# search with the stored JQL is rejected (see run).
+def ensure_selected_status_filters(project_key, refresh=False):
+    entry = load_filter_registry().get(project_key)
+    max_age = FILTER_REGISTRY_MAX_AGE_HOURS * 3600
+    if entry and entry.get("filters") and not refresh and time.time() - entry.get("resolved_at", 0) < max_age:
+        return entry["filters"]
+
+    filters = discover_status_filters(project_key)
+    with state_lock:
+        registry = load_filter_registry()
+        registry[project_key] = {"resolved_at": time.time(), "filters": filters}
+        save_filter_registry(registry)
+    return filters
+
+# Sync state is kept per project. A state file from before projects were
+# tracked separately is read as the default project's.
+def load_sync_state(project_key=PROJECT_KEY):
+    try:
+        with open(SYNC_STATE_PATH) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if "last_sync" in state:
+        state = {PROJECT_KEY: state}
+    return state.get(project_key, {})
+
+def save_sync_state(project_key, project_state):
+    with state_lock:
+        try:
+            with open(SYNC_STATE_PATH) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        if "last_sync" in state:
+            state = {PROJECT_KEY: state}
+        state[project_key] = project_state
+        with open(SYNC_STATE_PATH + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(SYNC_STATE_PATH + ".tmp", SYNC_STATE_PATH)
+
+def restrict_jql(jql, clause):
+    parts = re.split(r"\s+ORDER\s+BY\s+", jql, maxsplit=1, flags=re.IGNORECASE)
+    restricted = f"({parts[0]}) AND {clause}"
+    if len(parts) == 2:
+        restricted += f" ORDER BY {parts[1]}"
+    return restricted
+
+# A stored filter whose JQL Jira no longer accepts, e.g. after a status was renamed.
+class StaleFilterError(RuntimeError):
+    pass
+
+def fetch_issues_for_filter(filter_info, updated_within_minutes=None):
+    jql_query = filter_info["jql"]
+    if updated_within_minutes is not None:
+        # Relative dates avoid depending on the Jira user's time zone.
+        jql_query = restrict_jql(jql_query, f'updated >= "-{updated_within_minutes}m"')
+
+    try:
+        found = jira_client.search_issues(jql_query, fields="summary,status,duedate,resolution,labels")
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code in (400, 404):
+            raise StaleFilterError(f"Filter {filter_info['name']} ({filter_info['id']}) was rejected: {e}")
+        raise
+
     issues = []
-    for issue in data.get("issues", []):
+    for issue in found:
         fields = issue["fields"]
         labels = fields.get("labels", [])
         plat = ""
@@ -154,7 +246,7 @@ def fetch_issues_for_filter(filter_id):
                 ip = label
         issues.append({
             "Issue Key": issue["key"],
-            "Filter": filter_data["name"],
+            "Filter": filter_info["name"],
             "Summary": fields.get("summary", ""),
             "Platform": plat,
             "IP": ip,
@@ -164,19 +256,151 @@ def fetch_issues_for_filter(filter_id):
         })
     return issues
 
-def main():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    excel_path = os.path.join(base_dir, "data.xlsx")
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        for filter_type, filter_id in FILTER_IDS.items():
-            issues = fetch_issues_for_filter(filter_id)
-            if issues:
-                df = pd.DataFrame(issues)
-                df.to_excel(writer, sheet_name=filter_type, index=False)
-    print("Excel file updated")
+def fetch_full(filters):
+    frames = {}
+    for filter_type, filter_info in filters.items():
+        issues = fetch_issues_for_filter(filter_info)
+        if issues:
+            frames[filter_type] = pd.DataFrame(issues)
+    return frames
+
+# Issues updated since the last sync are dropped from every sheet and re-added to
+# the sheets whose filters still match them, so status moves are picked up too.
+# Deleted issues are only removed by the next full sync.
+def fetch_incremental(filters, since, snapshot_dir=snapshot.DEFAULT_SNAPSHOT_DIR):
+    current_dir = snapshot.current_dir(snapshot_dir)
+    minutes = math.ceil((time.time() - since) / 60) + SYNC_OVERLAP_MINUTES
+    changed = {
+        filter_type: fetch_issues_for_filter(filter_info, updated_within_minutes=minutes)
+        for filter_type, filter_info in filters.items()
+    }
+    changed_keys = {issue["Issue Key"] for issues in changed.values() for issue in issues}
+    print(f"Incremental sync of {os.path.basename(snapshot_dir)}: {len(changed_keys)} issues updated in the last {minutes} minutes")
+
+    frames = {}
+    for filter_type in filters:
+        existing = snapshot.read_sheet(filter_type, current_dir)
+        kept = existing[~existing["Issue Key"].isin(changed_keys)]
+        updated = pd.DataFrame(changed[filter_type], columns=snapshot.COLUMNS)
+        merged = pd.concat([updated, kept], ignore_index=True)
+        if not merged.empty:
+            frames[filter_type] = merged
+    return frames
+
+def main(filters, incremental=SYNC_MODE == "incremental", project_key=PROJECT_KEY):
+    started = time.time()
+    snapshot_dir = snapshot.project_dir(project_key)
+    state = load_sync_state(project_key)
+    last_sync = state.get("last_sync")
+    last_full_sync = state.get("last_full_sync") or 0
+    full_due = started - last_full_sync >= FULL_SYNC_INTERVAL_HOURS * 3600
+
+    frames = None
+    if incremental and last_sync and not full_due:
+        try:
+            frames = fetch_incremental(filters, last_sync, snapshot_dir)
+        except FileNotFoundError:
+            print(f"No existing snapshot for {project_key}, running a full sync")
+    if frames is None:
+        frames = fetch_full(filters)
+        last_full_sync = started
+
+    rows = snapshot.write_snapshot(frames, snapshot_dir)
+    print(f"Snapshot for {project_key} updated:", rows)
+    if EXPORT_XLSX:
+        snapshot.write_excel_export(frames, snapshot.excel_path(project_key))
+        print(f"Excel file for {project_key} updated")
+    save_sync_state(project_key, {"last_sync": started, "last_full_sync": last_full_sync})
+
+def sync_project(project_key, incremental):
+    filters = ensure_selected_status_filters(project_key)
+    print(f"FILTER_IDS[{project_key}] =", {key: info["id"] for key, info in filters.items()})
+    try:
+        main(filters, incremental, project_key)
+    except StaleFilterError as e:
+        print(f"{e}; looking the filters up again")
+        filters = ensure_selected_status_filters(project_key, refresh=True)
+        main(filters, incremental, project_key)
+
+def synced_since(project_key, since, incremental):
+    state = load_sync_state(project_key)
+    return (state.get("last_sync") or 0) >= since and (incremental or (state.get("last_full_sync") or 0) >= since)
+
+# Only one refresh may write the snapshot at a time, across processes too. A run
+# that finds another one in progress waits for it, then only syncs the projects
+# that run did not sync after this one was requested (a full sync is needed to
+# cover a full request).
+# Projects are synced concurrently, each into its own snapshot directory; one
+# project failing does not stop the others.
+def run(projects=None, incremental=SYNC_MODE == "incremental"):
+    if isinstance(projects, str):
+        projects = [projects]
+    projects = [p.upper() for p in (projects or PROJECTS)]
+    for project_key in projects:
+        if not snapshot.is_project_key(project_key):
+            raise RuntimeError(f"Invalid project key: {project_key}")
+
+    requested_at = time.time()
+    with open(REFRESH_LOCK_PATH, "w") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("Another refresh is already running, waiting for it to finish")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                covered = [p for p in projects if synced_since(p, requested_at, incremental)]
+                if covered:
+                    print("Already synced by the other refresh:", ", ".join(covered))
+                projects = [p for p in projects if p not in covered]
+                if not projects:
+                    return "Jira data refreshed!"
+
+        failed = {}
+        synced = []
+        progress_lock = Lock()
+
+        def sync_one(project_key):
+            error = None
+            try:
+                sync_project(project_key, incremental)
+            except Exception as e:
+                print(f"Sync of {project_key} failed: {e}", file=sys.stderr)
+                error = str(e)
+            with progress_lock:
+                if error is None:
+                    synced.append(project_key)
+                else:
+                    failed[project_key] = error
+                done = len(synced) + len(failed)
+            jobs.set_progress(done, len(projects), f"Synced {project_key}")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(PROJECT_WORKERS, len(projects)))) as executor:
+            list(executor.map(jobs.in_current_job(sync_one), projects))
+    if failed:
+        raise RuntimeError("Sync failed for " + ", ".join(f"{p} ({e})" for p, e in failed.items()))
+    return "Jira data refreshed!"
+
+# run() under the profiler, sampling the project and search pool threads too.
+# The profile is saved under profiling.PROFILE_DIR and its id printed. When
+# another profile is running, the refresh still runs, just unprofiled.
+def run_profiled(projects=None, **kwargs):
+    if isinstance(projects, str):
+        projects = [projects]
+    try:
+        result, profile = profiling.profile_call(run, projects, all_threads=True, **kwargs)
+    except profiling.ProfilerBusyError as e:
+        print(f"Not profiling this refresh: {e}")
+        return run(projects, **kwargs)
+    profile_id = profiling.save(profile, "prog.run " + ",".join(projects or PROJECTS))
+    print(f"Profile {profile_id} saved to {profiling.PROFILE_DIR}")
+    return result
 
 if __name__ == "__main__":
-    project_key = "DS"
-    FILTER_IDS = ensure_selected_status_filters(project_key)
-    print("FILTER_IDS =", FILTER_IDS)
-    main()
\ No newline at end of file
+    projects = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or None
+    runner = run_profiled if "--profile" in sys.argv else run
+    if "--full" in sys.argv:
+        runner(projects, incremental=False)
+    elif "--incremental" in sys.argv:
+        runner(projects, incremental=True)
+    else:
+        runner(projects)
@@ -1,42 +1,24 @@
-import requests
 import os
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import jira_client
+import metadata
+import jobs
 
-load_dotenv()
-
-JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
-JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
-JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
-
-BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-
-HEADERS = {
-    "Accept": "application/json",
-    "Content-Type": "application/json"
-}
-
-AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
+BASE_URL = jira_client.BASE_URL
+PERMISSION_WORKERS = int(os.environ.get("PERMISSION_WORKERS", "8"))
 
 def get_project_id(project_key):
-    url = f"{BASE_URL}/project/{project_key}"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code == 200:
-        return response.json().get("id")
-    print(f"[ERROR] Project ID fetch failed: {response.status_code} - {response.text}")
-    return None
+    return metadata.get_project_id(project_key)
 
 
 def get_project_role_id(project_key, role_name):
-    url = f"{BASE_URL}/project/{project_key}/role"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"[ERROR] Roles fetch failed: {response.status_code} - {response.text}")
+    roles = metadata.get_project_roles(project_key)
+    if roles is None:
         return None
 
-    roles = response.json()
-    for name, link in roles.items():
+    for name, role_id in roles.items():
         if name.lower() == role_name.lower():
-            return link.rstrip("/").split("/")[-1]
+            return role_id
 
     print(f"[ERROR] Role '{role_name}' not found in project '{project_key}'")
     return None
@@ -44,7 +26,7 @@ def get_project_role_id(project_key, role_name):
 
 def list_filter_permissions(filter_id):
     url = f"{BASE_URL}/filter/{filter_id}/permission"
-    response = requests.get(url, auth=AUTH)
+    response = jira_client.get(url)
     if response.status_code == 200:
         return response.json()
     print(f"[ERROR] Failed to list permissions: {response.status_code} - {response.text}")
@@ -58,7 +40,7 @@ def add_viewer_permission(filter_id, project_id, role_id):
         "projectId": project_id,
         "projectRoleId": role_id
     }
-    response = requests.post(url, json=payload, auth=AUTH, headers=HEADERS)
+    response = jira_client.post(url, json=payload)
     print(f"[ADD] Permission: {response.status_code} - {response.text}")
 
 def add_editor_permission(filter_id, project_id, role_id):
@@ -70,59 +52,60 @@ def add_editor_permission(filter_id, project_id, role_id):
         "view": True,
         "edit": True
     }
-    response = requests.post(url, json=payload, auth=AUTH, headers=HEADERS)
+    response = jira_client.post(url, json=payload)
     print(f"[ADD EDITOR] {response.status_code} - {response.text}")
 
-def remove_editor_permission(filter_id, project_id, role_id):
-    permissions = list_filter_permissions(filter_id)
-    for perm in permissions:
-        if (
-            perm.get("type") == "project" and
-            str(perm.get("project", {}).get("id")) == str(project_id) and
-            "role" in perm and
-            str(perm.get("role", {}).get("id")) == str(role_id)
-        ):
-            perm_id = perm["id"]
-            url = f"{BASE_URL}/filter/{filter_id}/permission/{perm_id}"
-            response = requests.delete(url, auth=AUTH)
-            print(f"[REMOVE EDITOR] Removed project+role editor (ID: {perm_id}): {response.status_code} - {response.text}")
-            return
-    print("[INFO] No matching project role editor permission found.")
-
-
-
-def remove_viewer_permission(filter_id, project_id, role_id):
-    permissions = list_filter_permissions(filter_id)
-    for perm in permissions:
-        print("[DEBUG] Permission Entry:", perm)
-
-        if (
-            perm["type"] == "project"
-            and str(perm.get("project", {}).get("id")) == str(project_id)
-            and str(perm.get("role", {}).get("id")) == str(role_id)
-        ):
-            perm_id = perm["id"]
-            url = f"{BASE_URL}/filter/{filter_id}/permission/{perm_id}"
-            response = requests.delete(url, auth=AUTH)
-            print(f"[REMOVE] project (ID: {perm_id}): {response.status_code} - {response.text}")
-            return
-    print("[INFO] No matching project viewer permission found.")
-
-
-def remove_all_viewers(filter_id):
-    while True:
+def is_project_role_permission(perm, project_id, role_id):
+    return (
+        perm.get("type") == "project"
+        and str(perm.get("project", {}).get("id")) == str(project_id)
+        and "role" in perm
+        and str(perm.get("role", {}).get("id")) == str(role_id)
+    )
+
+# Deletes the given permissions concurrently, then lists the filter once more to
+# confirm they are gone.
+def delete_filter_permissions(filter_id, permissions, label):
+    def delete_one(perm):
+        perm_id = perm["id"]
+        url = f"{BASE_URL}/filter/{filter_id}/permission/{perm_id}"
+        response = jira_client.delete(url)
+        print(f"[{label}] Removed {perm['type']} permission ID {perm_id}: {response.status_code}")
+        return response.status_code
+
+    if not permissions:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, PERMISSION_WORKERS)) as executor:
+        list(executor.map(jobs.in_current_job(delete_one), permissions))
+
+    targeted = {str(perm["id"]) for perm in permissions}
+    remaining = [perm for perm in list_filter_permissions(filter_id) if str(perm["id"]) in targeted]
+    if remaining:
+        ids = ", ".join(str(perm["id"]) for perm in remaining)
+        raise RuntimeError(f"Failed to remove permission(s) {ids} from filter {filter_id}")
+    return len(permissions)
+
+def remove_editor_permission(filter_id, project_id, role_id, permissions=None):
+    if permissions is None:
+        permissions = list_filter_permissions(filter_id)
+    matches = [perm for perm in permissions if is_project_role_permission(perm, project_id, role_id)]
+    if not matches:
+        print("[INFO] No matching project role editor permission found.")
+    return delete_filter_permissions(filter_id, matches, "REMOVE EDITOR")
+
+def remove_viewer_permission(filter_id, project_id, role_id, permissions=None):
+    if permissions is None:
+        permissions = list_filter_permissions(filter_id)
+    matches = [perm for perm in permissions if is_project_role_permission(perm, project_id, role_id)]
+    if not matches:
+        print("[INFO] No matching project viewer permission found.")
+    return delete_filter_permissions(filter_id, matches, "REMOVE")
+
+def remove_all_viewers(filter_id, permissions=None):
+    if permissions is None:
         permissions = list_filter_permissions(filter_id)
-        removed = False
-        for perm in permissions:
-            if perm["type"] in {"project", "projectRole", "user", "group", "global"}:
-                perm_id = perm["id"]
-                url = f"{BASE_URL}/filter/{filter_id}/permission/{perm_id}"
-                response = requests.delete(url, auth=AUTH)
-                print(f"[REMOVE ALL] Removed {perm['type']} viewer ID {perm_id}: {response.status_code}")
-                removed = True
-                break
-        if not removed:
-            break
+    matches = [perm for perm in permissions if perm["type"] in {"project", "projectRole", "user", "group", "global"}]
+    return delete_filter_permissions(filter_id, matches, "REMOVE ALL")
 
 def print_permissions(title, permissions):
     print(f"\n--- {title} ---")
@@ -131,81 +114,65 @@ def print_permissions(title, permissions):
     print("--- End ---\n")
 
 def get_filter_id_by_name(filter_name):
-    url = f"{BASE_URL}/filter/search?filterName={filter_name}"
-    response = requests.get(url, auth=AUTH, headers=HEADERS)
-    if response.status_code == 200:
-        filters = response.json().get("values", [])
-        for f in filters:
-            if f.get("name", "").lower() == filter_name.lower():
-                return str(f.get("id"))
-        print(f"[ERROR] Filter '{filter_name}' not found.")
+    filters = metadata.search_filters(filter_name)
+    if filters is None:
         return None
-    print(f"[ERROR] Filter search failed: {response.status_code} - {response.text}")
+    for f in filters:
+        if f.get("name", "").lower() == filter_name.lower():
+            return str(f.get("id"))
+    print(f"[ERROR] Filter '{filter_name}' not found.")
     return None
 
-if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) < 6 and sys.argv[1] != "remove-all":
-        print("Usage: roles.py <add|remove> <viewer|editor> <filter_id> <project_key> <role_name>", file=sys.stderr)
-        print("For remove-all: roles.py remove-all <filter_id> <project_key> <dummy>", file=sys.stderr)
-        sys.exit(1)
-
-    action = sys.argv[1]      
-    if action in ("add", "remove"):
-        role_type = sys.argv[2]
-        filter_identifier = sys.argv[3]  
-        project_key = sys.argv[4]
-        role_name = sys.argv[5]
-    elif action == "remove-all":
-        filter_identifier = sys.argv[2]
-        project_key = sys.argv[3]
-    else:
-        print("Unknown action", file=sys.stderr)
-        sys.exit(1)
+def run(action, filter_identifier, project_key, role_type=None, role_name=None):
+    if action not in ("add", "remove", "remove-all"):
+        raise RuntimeError("Unknown action")
 
     project_id = get_project_id(project_key)
     if not project_id:
-        print("Invalid project", file=sys.stderr)
-        sys.exit(1)
+        raise RuntimeError("Invalid project")
 
     if filter_identifier.isdigit():
         filter_id = filter_identifier
     else:
         filter_id = get_filter_id_by_name(filter_identifier)
         if not filter_id:
-            print("Invalid filter name", file=sys.stderr)
-            sys.exit(1)
+            raise RuntimeError("Invalid filter name")
+
+    if action == "remove-all":
+        remove_all_viewers(filter_id)
+        return
+
+    role_id = get_project_role_id(project_key, role_name)
+    if not role_id:
+        raise RuntimeError("Invalid role")
+    if role_type not in ("viewer", "editor"):
+        raise RuntimeError("Invalid role type")
 
     if action == "add":
-        role_id = get_project_role_id(project_key, role_name)
-        if not role_id:
-            print("Invalid role", file=sys.stderr)
-            sys.exit(1)
         if role_type == "viewer":
             add_viewer_permission(filter_id, project_id, role_id)
-        elif role_type == "editor":
-            add_editor_permission(filter_id, project_id, role_id)
         else:
-            print("Invalid role type", file=sys.stderr)
-            sys.exit(1)
-
-    elif action == "remove":
-        role_id = get_project_role_id(project_key, role_name)
-        if not role_id:
-            print("Invalid role", file=sys.stderr)
-            sys.exit(1)
+            add_editor_permission(filter_id, project_id, role_id)
+    else:
         if role_type == "viewer":
             remove_viewer_permission(filter_id, project_id, role_id)
-        elif role_type == "editor":
-            remove_editor_permission(filter_id, project_id, role_id)
         else:
-            print("Invalid role type", file=sys.stderr)
-            sys.exit(1)
+            remove_editor_permission(filter_id, project_id, role_id)
 
-    elif action == "remove-all":
-        remove_all_viewers(filter_id)
+if __name__ == "__main__":
+    import sys
 
-    else:
-        print("Unknown action", file=sys.stderr)
-        sys.exit(1)
\ No newline at end of file
+    if len(sys.argv) < 6 and sys.argv[1] != "remove-all":
+        print("Usage: roles.py <add|remove> <viewer|editor> <filter_id> <project_key> <role_name>", file=sys.stderr)
+        print("For remove-all: roles.py remove-all <filter_id> <project_key> <dummy>", file=sys.stderr)
+        sys.exit(1)
+
+    action = sys.argv[1]
+    try:
+        if action in ("add", "remove"):
+            run(action, sys.argv[3], sys.argv[4], role_type=sys.argv[2], role_name=sys.argv[5])
+        else:
+            run(action, sys.argv[2], sys.argv[3])
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import time
+import shutil
+from startup import lazy_import
+
+pd = lazy_import("pandas")
+feather = lazy_import("pyarrow.feather")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR") or os.path.join(BASE_DIR, "snapshot")
+EXCEL_PATH = os.environ.get("EXCEL_PATH") or os.path.join(BASE_DIR, "data.xlsx")
+
+# Projects synced by prog.py; the first one is served when no project is given.
+PROJECTS = [p.strip().upper() for p in os.environ.get("JIRA_PROJECTS", "DS").split(",") if p.strip()] or ["DS"]
+DEFAULT_PROJECT = PROJECTS[0]
+DEFAULT_SNAPSHOT_DIR = os.path.join(SNAPSHOT_DIR, DEFAULT_PROJECT)
+
+PLATFORMS = ["JTAMP", "JTAES", "JTAEN", "SVB"]
+SHEETS = ["Target", "Pass", "Fail", "Unresolved"]
+COLUMNS = ["Issue Key", "Filter", "Summary", "Platform", "IP", "Status", "Due Date", "Resolution"]
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+VERSIONS = "versions"
+# Published versions kept per project, the current one included, for rollback.
+KEEP_VERSIONS = max(1, int(os.environ.get("SNAPSHOT_KEEP_VERSIONS", "5")))
+
+def is_project_key(project):
+    return bool(re.fullmatch(r"[A-Z][A-Z0-9_]*", project or ""))
+
+# Each project's sheets live in their own directory, so one project can be
+# rewritten or loaded without touching the others.
+def project_dir(project=DEFAULT_PROJECT):
+    if not is_project_key(project):
+        raise ValueError(f"Invalid project key: {project!r}")
+    return os.path.join(SNAPSHOT_DIR, project)
+
+def excel_path(project=DEFAULT_PROJECT):
+    if project == DEFAULT_PROJECT:
+        return EXCEL_PATH
+    if not is_project_key(project):
+        raise ValueError(f"Invalid project key: {project!r}")
+    return os.path.join(os.path.dirname(EXCEL_PATH), f"data_{project}.xlsx")
+
+def sheet_path(sheet, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"{sheet}.feather")
+
+def manifest_path(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, MANIFEST)
+
+def versions_dir(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, VERSIONS)
+
+def list_versions(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    try:
+        names = os.listdir(versions_dir(snapshot_dir))
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names
+                  if not name.startswith(".") and os.path.exists(manifest_path(os.path.join(versions_dir(snapshot_dir), name))))
+
+def current_version(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# The directory holding the live sheets of a project: the version CURRENT points
+# at, or the project directory itself for snapshots written before versioning.
+# Raises FileNotFoundError when the project has no snapshot.
+def current_dir(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    version = current_version(snapshot_dir)
+    path = os.path.join(versions_dir(snapshot_dir), version) if version else snapshot_dir
+    if not os.path.exists(manifest_path(path)):
+        raise FileNotFoundError(manifest_path(path))
+    return path
+
+def empty_sheet():
+    return pd.DataFrame({col: pd.Series(dtype="object") for col in COLUMNS})
+
+# An Excel round trip reads empty cells back as missing values; Feather keeps "".
+# Blank text is stored as missing so issues without a platform or IP label are
+# left out of the summaries the same way they were when data.xlsx was the source.
+def blank_to_missing(df):
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].mask(df[col] == "")
+    return df
+
+# UTC timestamps to the microsecond, so versions sort in the order written.
+def new_version_id():
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(seconds)) + f"-{nanos // 1000:06d}"
+
+# Points CURRENT at a version by replacing the pointer file, so readers see
+# either the old version or the new one, never a mix.
+def publish(version, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    if not os.path.exists(manifest_path(os.path.join(versions_dir(snapshot_dir), version))):
+        raise FileNotFoundError(f"No complete snapshot version {version!r} in {snapshot_dir}")
+    pointer = os.path.join(snapshot_dir, CURRENT)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+
+# Drops the oldest versions beyond `keep`, never the current one, plus the sheets
+# of the pre-versioning layout and unfinished writes left by a crashed refresh.
+# Readers that still have an old version mapped keep working; its files are only
+# unlinked.
+def prune_versions(snapshot_dir=DEFAULT_SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    current = current_version(snapshot_dir)
+    versions = [v for v in list_versions(snapshot_dir) if v != current]
+    for version in versions[:max(0, len(versions) - (keep - 1))]:
+        shutil.rmtree(os.path.join(versions_dir(snapshot_dir), version), ignore_errors=True)
+    try:
+        names = os.listdir(versions_dir(snapshot_dir))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        path = os.path.join(versions_dir(snapshot_dir), name)
+        if name.startswith(".") and time.time() - os.path.getmtime(path) > 3600:
+            shutil.rmtree(path, ignore_errors=True)
+    if current:
+        for name in [MANIFEST] + [f"{sheet}.feather" for sheet in SHEETS]:
+            try:
+                os.remove(os.path.join(snapshot_dir, name))
+            except FileNotFoundError:
+                pass
+
+# Each write goes to a new version directory, named with a leading dot until it
+# is complete and renamed into place, and only then becomes current. Sheets are
+# stored uncompressed so they can be memory-mapped on load.
+def write_snapshot(frames, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    os.makedirs(versions_dir(snapshot_dir), exist_ok=True)
+    version = new_version_id()
+    while os.path.exists(os.path.join(versions_dir(snapshot_dir), version)):
+        time.sleep(0.001)
+        version = new_version_id()
+    staging = os.path.join(versions_dir(snapshot_dir), f".{version}.{os.getpid()}")
+    os.makedirs(staging)
+    rows = {}
+    try:
+        for sheet in SHEETS:
+            df = frames.get(sheet)
+            if df is None:
+                df = empty_sheet()
+            df = blank_to_missing(df.reset_index(drop=True))
+            df.to_feather(sheet_path(sheet, staging), compression="uncompressed")
+            rows[sheet] = len(df)
+        with open(manifest_path(staging), "w") as f:
+            json.dump({"version": version, "written_at": time.time(), "sheets": SHEETS, "rows": rows}, f)
+        os.rename(staging, os.path.join(versions_dir(snapshot_dir), version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    publish(version, snapshot_dir)
+    prune_versions(snapshot_dir)
+    return rows
+
+def read_sheet(sheet, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    table = feather.read_table(sheet_path(sheet, snapshot_dir), memory_map=True)
+    return table.to_pandas()
+
+def read_manifest(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    with open(manifest_path(snapshot_dir)) as f:
+        return json.load(f)
+
+# Written next to the target and renamed over it, so a reader opening the
+# workbook gets either the previous file or the complete new one.
+def write_excel_export(frames, excel_path=EXCEL_PATH):
+    root, ext = os.path.splitext(excel_path)
+    tmp_path = f"{root}.tmp{ext}"
+    try:
+        with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+            for sheet in SHEETS:
+                df = frames.get(sheet)
+                if df is not None and not df.empty:
+                    df.to_excel(writer, sheet_name=sheet, index=False)
+        os.replace(tmp_path, excel_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def frames_from_excel(excel_path=EXCEL_PATH):
+    xls = pd.ExcelFile(excel_path)
+    return {sheet: pd.read_excel(xls, sheet) for sheet in SHEETS if sheet in xls.sheet_names}
+
+if __name__ == "__main__":
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    project = args[0].upper() if args else DEFAULT_PROJECT
+    snapshot_dir = project_dir(project)
+    if "--list" in sys.argv:
+        current = current_version(snapshot_dir)
+        for version in list_versions(snapshot_dir):
+            manifest = read_manifest(os.path.join(versions_dir(snapshot_dir), version))
+            print(("* " if version == current else "  ") + version, manifest.get("rows"))
+    elif "--rollback" in sys.argv:
+        versions = list_versions(snapshot_dir)
+        current = current_version(snapshot_dir)
+        if len(args) > 1:
+            version = args[1]
+        else:
+            older = [v for v in versions if current and v < current]
+            if not older:
+                sys.exit(f"No version older than {current} to roll back to")
+            version = older[-1]
+        publish(version, snapshot_dir)
+        print(f"{project} now serves snapshot version {version}")
+    else:
+        rows = write_snapshot(frames_from_excel(excel_path(project)), snapshot_dir)
+        print(f"Snapshot written to {current_dir(snapshot_dir)}: {rows}")
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import types
+import importlib
+import threading
+from contextlib import contextmanager
+
+STARTED_AT = time.time()
+
+timings = {}
+timings_lock = threading.Lock()
+
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with timings_lock:
+            timings[phase] = {"seconds": round(seconds, 4), "pid": os.getpid(), "at": time.time()}
+
+# Records the time from process start-up (this module's import) to now.
+def mark(phase):
+    with timings_lock:
+        timings[phase] = {"seconds": round(time.time() - STARTED_AT, 4), "pid": os.getpid(), "at": time.time()}
+
+def get_timings():
+    with timings_lock:
+        return {phase: dict(entry) for phase, entry in timings.items()}
+
+# Stands in for a module until one of its attributes is used, so heavy libraries
+# (pandas, numpy, pyarrow) are imported by the first code that needs them rather
+# than when the app is loaded. The import is recorded as an "import <name>" phase.
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        with self._lazy_lock:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                already_loaded = self.__name__ in sys.modules
+                if already_loaded:
+                    module = sys.modules[self.__name__]
+                else:
+                    with timed(f"import {self.__name__}"):
+                        module = importlib.import_module(self.__name__)
+                self.__dict__["_lazy_module"] = module
+            return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name):
+    return LazyModule(name)
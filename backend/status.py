@@ -1,17 +1,29 @@
-import requests
 import os
-from dotenv import load_dotenv
+import sys
+import json
+import uuid
+import hashlib
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+import jira_client
+import jobs
 
-load_dotenv()
+BASE_URL = jira_client.BASE_URL
+TEXT_FILES_DIR = os.environ.get("STATUS_FILES_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_files")
+STATUS_WORKERS = int(os.environ.get("STATUS_WORKERS", "4"))
+ATTACHMENT_MANIFEST_PATH = os.environ.get("ATTACHMENT_MANIFEST_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "attachment_manifest.json")
+HASH_CHUNK_SIZE = 1024 * 1024
 
-JIRA_DOMAIN = os.environ.get("JIRA_DOMAIN")
-JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
-JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
+def get_issue(issue_key):
+    url = f"{BASE_URL}/issue/{issue_key}"
+    response = jira_client.get(url, params={"fields": "status,issuetype,project,attachment"})
+    response.raise_for_status()
+    return response.json()
 
 def get_transition_id(issue_key, target_status):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key}/transitions"
-    headers = {"Accept": "application/json"}
-    response = requests.get(url, headers=headers, auth=(JIRA_EMAIL, JIRA_API_TOKEN))
+    url = f"{BASE_URL}/issue/{issue_key}/transitions"
+    response = jira_client.get(url)
     transitions = response.json().get("transitions", [])
 
     for transition in transitions:
@@ -19,53 +31,231 @@ def get_transition_id(issue_key, target_status):
             return transition["id"]
     return None
 
-def transition_issue(issue_key, target_status):
-    transition_id = get_transition_id(issue_key, target_status)
-    if transition_id:
-        url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key}/transitions"
-        payload = {"transition": {"id": transition_id}}
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(url, json=payload, headers=headers, auth=(JIRA_EMAIL, JIRA_API_TOKEN))
-        print(f"Issue {issue_key} transitioned to {target_status}.")
-    else:
-        print(f"No valid transition to '{target_status}' for issue {issue_key}.")
-
-def delete_all_attachments(issue_key):
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key}?fields=attachment"
-    headers = {"Accept": "application/json"}
-    response = requests.get(url, headers=headers, auth=(JIRA_EMAIL, JIRA_API_TOKEN))
-    attachments = response.json().get("fields", {}).get("attachment", [])
+def post_transition(issue_key, transition_id):
+    url = f"{BASE_URL}/issue/{issue_key}/transitions"
+    payload = {"transition": {"id": transition_id}}
+    return jira_client.post(url, json=payload)
+
+# Transition ids depend on the workflow, so cached ids are keyed on project, issue
+# type and current status as well as the target. A cached id that Jira rejects is
+# dropped and looked up again.
+def transition_issue(issue_key, target_status, issue=None, transition_cache=None):
+    if issue is None:
+        issue = get_issue(issue_key)
+    fields = issue.get("fields", {})
+    current_status = fields.get("status", {}).get("name", "")
+    if current_status.lower() == target_status.lower():
+        print(f"Issue {issue_key} is already in {target_status}.")
+        return "unchanged"
+
+    cache_key = (
+        fields.get("project", {}).get("id"),
+        fields.get("issuetype", {}).get("id"),
+        current_status.lower(),
+        target_status.lower(),
+    )
+    if transition_cache is None:
+        transition_cache = {}
+    transition_id = transition_cache.get(cache_key)
+    response = post_transition(issue_key, transition_id) if transition_id else None
+    if response is None or response.status_code >= 400:
+        transition_id = get_transition_id(issue_key, target_status)
+        if not transition_id:
+            print(f"No valid transition to '{target_status}' for issue {issue_key}.")
+            return "no-transition"
+        transition_cache[cache_key] = transition_id
+        response = post_transition(issue_key, transition_id)
+    if response.status_code >= 400:
+        raise RuntimeError(f"Transition of {issue_key} failed: {response.status_code} {response.text}")
+    print(f"Issue {issue_key} transitioned to {target_status}.")
+    return "transitioned"
+
+def delete_all_attachments(issue_key, attachments=None):
+    if attachments is None:
+        url = f"{BASE_URL}/issue/{issue_key}?fields=attachment"
+        response = jira_client.get(url)
+        attachments = response.json().get("fields", {}).get("attachment", [])
     for att in attachments:
         att_id = att["id"]
-        del_url = f"https://{JIRA_DOMAIN}/rest/api/3/attachment/{att_id}"
-        del_resp = requests.delete(del_url, headers=headers, auth=(JIRA_EMAIL, JIRA_API_TOKEN))
+        del_url = f"{BASE_URL}/attachment/{att_id}"
+        del_resp = jira_client.delete(del_url)
         if del_resp.status_code == 204:
             print(f"Deleted attachment {att_id} from {issue_key}")
         else:
             print(f"Failed to delete attachment {att_id} from {issue_key}")
 
-def attach_file(issue_key, file_path):
-    delete_all_attachments(issue_key)
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{issue_key}/attachments"
-    headers = {
-        "X-Atlassian-Token": "no-check"
-    }
-    files = {
-        'file': (os.path.basename(file_path), open(file_path, 'rb'))
-    }
-    response = requests.post(url, headers=headers, files=files, auth=(JIRA_EMAIL, JIRA_API_TOKEN))
+def load_manifest(path=ATTACHMENT_MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest, path=ATTACHMENT_MANIFEST_PATH):
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+# A multipart/form-data body that reads the file from disk as it is sent. It has a
+# length, so requests sends a Content-Length instead of buffering or chunking.
+class MultipartFile:
+    def __init__(self, file_path, field="file"):
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(file_path).replace('"', '')
+        self.head = (f'--{self.boundary}\r\n'
+                     f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.length = len(self.head) + os.path.getsize(file_path) + len(self.tail)
+        self.parts = [self.head, None, self.tail]
+        self.file = open(file_path, "rb")
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        chunks = []
+        while self.parts and (size < 0 or size > 0):
+            part = self.parts[0]
+            if part is None:
+                data = self.file.read(size)
+                if not data or size < 0:
+                    self.parts.pop(0)
+                    if not data:
+                        continue
+            else:
+                data = part if size < 0 else part[:size]
+                rest = part[len(data):]
+                if rest:
+                    self.parts[0] = rest
+                else:
+                    self.parts.pop(0)
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+    def close(self):
+        self.file.close()
+
+def upload_attachment(issue_key, file_path):
+    url = f"{BASE_URL}/issue/{issue_key}/attachments"
+    # The body is streamed from disk, so each attempt (e.g. after a 429) gets a new one.
+    def make_body():
+        body = MultipartFile(file_path)
+        return body, {"X-Atlassian-Token": "no-check", "Content-Type": body.content_type}
+    response = jira_client.post(url, make_body=make_body)
+    response.raise_for_status()
+    return response.json()
+
+# The file is only uploaded when its hash/size differ from what the manifest says we
+# last uploaded, and that attachment is still on the issue with the same size.
+# Either way the issue ends up with this file as its only attachment. The old
+# attachments are only deleted once the new one is up, so a failed upload leaves
+# the previous log in place.
+def attach_file(issue_key, file_path, attachments=None, manifest=None, manifest_lock=None):
+    if attachments is None:
+        attachments = get_issue(issue_key).get("fields", {}).get("attachment", [])
+    if manifest is None:
+        manifest = {}
+    manifest_lock = manifest_lock or Lock()
+
+    filename = os.path.basename(file_path)
+    manifest_key = f"{issue_key}/{filename}"
+    sha256, size = file_digest(file_path)
+    with manifest_lock:
+        entry = manifest.get(manifest_key)
+
+    current = None
+    if entry and entry.get("sha256") == sha256 and entry.get("size") == size:
+        current = next((att for att in attachments
+                        if str(att.get("id")) == str(entry.get("attachment_id"))
+                        and att.get("filename") == filename
+                        and att.get("size") == size), None)
+
+    stale = [att for att in attachments if att is not current]
+    if current is not None:
+        delete_all_attachments(issue_key, stale)
+        print(f"Attachment on issue {issue_key} is up to date.")
+        return "unchanged"
+
+    uploaded = upload_attachment(issue_key, file_path)
+    attachment_id = uploaded[0].get("id") if isinstance(uploaded, list) and uploaded else None
+    with manifest_lock:
+        manifest[manifest_key] = {"sha256": sha256, "size": size, "attachment_id": attachment_id}
+    delete_all_attachments(issue_key, stale)
     print(f"Attached file to issue {issue_key}.")
+    return "uploaded"
+
+def parse_result_filename(filename):
+    parts = filename.split("_")
+    if not filename.endswith(".txt") or len(parts) != 2:
+        return None
+    return parts[0], parts[1].replace(".txt", "")
+
+def process_file(folder_path, filename, transition_cache, manifest, manifest_lock):
+    outcome = {"file": filename, "issue": None, "status": "skipped"}
+    parsed = parse_result_filename(filename)
+    if parsed is None:
+        return outcome
+    issue_key, target_status = parsed
+    outcome["issue"] = issue_key
+    try:
+        issue = get_issue(issue_key)
+        outcome["transition"] = transition_issue(issue_key, target_status, issue, transition_cache)
+        attachments = issue.get("fields", {}).get("attachment", [])
+        outcome["attachment"] = attach_file(issue_key, os.path.join(folder_path, filename),
+                                            attachments, manifest, manifest_lock)
+        outcome["status"] = "ok"
+    except Exception as e:
+        print(f"Failed to process {filename}: {e}", file=sys.stderr)
+        outcome["status"] = "failed"
+        outcome["error"] = str(e)
+    return outcome
+
+def process_txt_files(folder_path=TEXT_FILES_DIR, max_workers=STATUS_WORKERS):
+    filenames = sorted(f for f in os.listdir(folder_path) if f.endswith(".txt"))
+    transition_cache = {}
+    manifest = load_manifest()
+    manifest_lock = Lock()
+    outcomes = []
+    outcomes_lock = Lock()
+
+    def run_one(filename):
+        outcome = process_file(folder_path, filename, transition_cache, manifest, manifest_lock)
+        with outcomes_lock:
+            outcomes.append(outcome)
+            done = len(outcomes)
+        jobs.set_progress(done, len(filenames))
+        return outcome
 
-def process_txt_files(folder_path):
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".txt"):
-            parts = filename.split("_")
-            if len(parts) == 2:
-                issue_key = parts[0]
-                status = parts[1].replace(".txt", "")
-                file_path = os.path.join(folder_path, filename)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = list(executor.map(jobs.in_current_job(run_one), filenames))
+    finally:
+        save_manifest(manifest)
 
-                transition_issue(issue_key, status)
-                attach_file(issue_key, file_path)
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("ok", "failed", "skipped")}
+    message = f"Processed {counts['ok']} of {len(filenames)} result files"
+    if counts["failed"]:
+        message += f", {counts['failed']} failed"
+    return {"message": message + ".", "counts": counts, "files": results}
 
-process_txt_files("text_files")
+if __name__ == "__main__":
+    result = process_txt_files(sys.argv[1] if len(sys.argv) > 1 else TEXT_FILES_DIR)
+    print(result["message"])
+    if result["counts"]["failed"]:
+        sys.exit(1)
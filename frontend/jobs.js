@@ -0,0 +1,32 @@
+// Long-running actions return a job id; poll it until the job finishes and
+// resolve with the same {status, message} shape the endpoints used to return.
+// A finished job whose result carries its own status (e.g. a bulk delete where
+// some issues failed) resolves with that status.
+function waitForJob(data, onProgress) {
+  if (!data || !data.job_id) {
+    return Promise.resolve(data);
+  }
+  return new Promise((resolve, reject) => {
+    function poll() {
+      fetch(`/api/jobs/${data.job_id}`)
+        .then(r => r.json())
+        .then(job => {
+          if (job.status === "succeeded") {
+            const status = (job.result && job.result.status) || "success";
+            resolve({status: status, message: job.message, job: job});
+          } else if (job.status === "failed") {
+            resolve({status: "error", message: job.error || "Job failed.", job: job});
+          } else if (job.status === "queued" || job.status === "running") {
+            if (onProgress) {
+              onProgress(job);
+            }
+            setTimeout(poll, 1000);
+          } else {
+            resolve({status: "error", message: job.message || "Unknown job."});
+          }
+        })
+        .catch(reject);
+    }
+    poll();
+  });
+}
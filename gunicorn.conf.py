@@ -0,0 +1,35 @@
+import os
+import sys
+
+# gunicorn reads this file from the working directory, so it applies to the
+# documented start command `gunicorn backend.app:app`.
+
+# Every open dashboard keeps a /events/snapshot stream (and the request thread
+# serving it) busy, so workers serve requests on a thread pool; with the default
+# sync worker one open tab would block everything else.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+
+# Background jobs, refresh coalescing and the refresh scheduler live in the
+# memory of the worker that started them, so /api/jobs/<id> and
+# /refresh-jira/status only answer correctly when every request reaches that
+# worker. Run exactly one; a larger -w, WEB_CONCURRENCY or TTIN is undone.
+workers = 1
+
+def nworkers_changed(server, new_value, old_value):
+    if new_value is not None and new_value > 1:
+        server.log.warning("Running 1 worker instead of %s: job state is kept in the worker's memory", new_value)
+        server.num_workers = 1
+
+# With PRELOAD_SNAPSHOT=1 the app is imported and the snapshot loaded and indexed
+# once in the master, so a restarted worker starts with it already in memory.
+preload_app = os.environ.get("PRELOAD_SNAPSHOT", "0") == "1"
+
+if preload_app:
+    os.environ["APP_PRELOADED"] = "1"
+
+# Threads started while the master imported the app do not exist in the workers.
+def post_fork(server, worker):
+    app_module = sys.modules.get("backend.app")
+    if app_module is not None:
+        app_module.start_background_threads()